@@ -0,0 +1,65 @@
+"""
+Forwards the post history of one author to the push chat.
+
+    python backfill.py <handle or did>
+
+Progress is checkpointed in data/backfill, run it again to resume. It runs
+next to the bot, so it needs the shared cache (cache_uri = redis://...) to
+skip what the bot already sent; without one, use /backfill_bsky instead.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from pyrogram import Client
+
+from src.config import config
+from src.core.bsky import BskyClient
+from src.core.cache import Cache
+from src.defs.backfill import Backfill
+from src.utils.log import logs
+
+
+async def on_progress(backfill: Backfill):
+    print(backfill.progress, flush=True)
+
+
+async def backfill(actor: str):
+    cache, client = Cache(), BskyClient()
+    # the running bot holds data/bot.session and handles the updates
+    bot = Client(
+        "backfill",
+        api_id=config.bot.api_id,
+        api_hash=config.bot.api_hash,
+        bot_token=config.bot.token,
+        in_memory=True,
+        no_updates=True,
+    )
+    await cache.initialize()
+    await client.initialize()
+    await bot.start()
+    try:
+        # the message index file belongs to the running bot
+        item = await Backfill.open(client, bot, actor, persist_index=False)
+        logs.info("[backfill] Start backfill of @%s", item.state.handle)
+        await item.run(on_progress)
+        print(item.progress)
+    finally:
+        await bot.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("actor", help="handle or did of the author")
+    args = parser.parse_args()
+    if config.cache_uri.startswith("mem://"):
+        sys.exit(
+            "backfill.py needs the cache shared with the bot, "
+            "set cache_uri or use /backfill_bsky"
+        )
+    asyncio.run(backfill(args.actor))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 import dotenv
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 dotenv.load_dotenv(dotenv_path=dotenv.find_dotenv(usecwd=True))
@@ -25,6 +26,9 @@ class BotConfig(Settings):
 class PushConfig(Settings):
     chat_id: int
     topic_id: Optional[int] = None
+    # telegram api calls per minute shared by sends and edits, 0 to disable
+    rate_per_minute: int = 20
+    rate_burst: int = 20
 
     model_config = SettingsConfigDict(env_prefix="push_")
 
@@ -36,10 +40,172 @@ class BskyConfig(Settings):
     model_config = SettingsConfigDict(env_prefix="bsky_")
 
 
+class SourceConfig(BaseModel):
+    kind: Literal["timeline", "feed", "list"] = "feed"
+    # at-uri of the feed generator or list, unused for the timeline
+    uri: str = ""
+    # minutes between polls of this source
+    interval: int = 5
+
+
+class FeedsConfig(Settings):
+    # mirror the home timeline
+    timeline: bool = True
+    # extra custom feeds and lists, as json
+    sources: List[SourceConfig] = []
+    # pages a chronological source may read to catch up after a gap
+    max_pages: int = 3
+
+    model_config = SettingsConfigDict(env_prefix="feeds_")
+
+
+class DigestConfig(Settings):
+    enable: bool = False
+    # switch to digest when this many posts are waiting ...
+    backlog: int = 20
+    # ... or when this many messages were sent in the last minute
+    rate: int = 20
+    max_length: int = 4096
+
+    model_config = SettingsConfigDict(env_prefix="digest_")
+
+
+class LogConfig(Settings):
+    level: str = "INFO"
+    # one json object per line instead of colored text
+    json_format: bool = False
+    # per-post lines allowed per interval, the rest are counted and dropped
+    sample_burst: int = 20
+    sample_interval: float = 10.0
+
+    model_config = SettingsConfigDict(env_prefix="log_")
+
+
+class MediaConfig(Settings):
+    # worker processes used to re-encode images
+    workers: int = 2
+    # downloads larger than this are not processed
+    max_download: int = 30 * 1024 * 1024
+    # images are re-encoded when larger than this
+    photo_max_bytes: int = 5 * 1024 * 1024
+    photo_max_side: int = 2560
+    # local copies above this size are deleted, least recently used first,
+    # 0 keeps them all
+    cache_mb: int = 512
+
+    model_config = SettingsConfigDict(env_prefix="media_")
+
+
+class QueueConfig(Settings):
+    maxsize: int = 1000
+    # posts sent per round before the queue is re-prioritized
+    batch: int = 20
+    # handles or dids whose posts and reposts always go first
+    allow_authors: List[str] = []
+    # posts younger than this go out before any older backlog
+    fresh_minutes: int = 30
+    # reposts older than this are dropped, 0 to keep them
+    drop_repost_hours: int = 6
+    # stale posts beyond this backlog are collapsed into a summary, 0 to disable
+    summary_over: int = 200
+
+    model_config = SettingsConfigDict(env_prefix="queue_")
+
+
+class ClusterConfig(Settings):
+    # coordinate several replicas through the shared cache backend
+    enable: bool = False
+    # defaults to hostname:pid
+    replica_id: str = ""
+    # leader lease in seconds, renewed every third of it
+    lease: int = 30
+    # how long a replica owns a post it claimed for sending
+    claim_ttl: int = 600
+    # how long fetched posts wait for any replica to send them
+    pending_ttl: int = 3600
+    # failed sends of a post, across replicas, before it is given up
+    max_attempts: int = 3
+
+    model_config = SettingsConfigDict(env_prefix="cluster_")
+
+
+class RefreshConfig(Settings):
+    # edit sent messages with current like/quote/reply/repost counts
+    enable: bool = False
+    # messages older than this are no longer refreshed
+    max_age_hours: int = 24
+    # refresh interval of a new message, doubling every `doubling_hours`
+    base_minutes: int = 5
+    doubling_hours: float = 4
+    # a count change is noticeable when it is at least min_delta and min_ratio
+    min_delta: int = 2
+    min_ratio: float = 0.1
+    # rate limit tokens left for new posts, edits never use them
+    reserve: int = 5
+    maxsize: int = 2000
+
+    model_config = SettingsConfigDict(env_prefix="refresh_")
+
+
+class CrosspostConfig(Settings):
+    enable: bool = False
+    # messages of this chat are posted to bsky
+    chat_id: int = 0
+    # message groups waiting to be posted, the handler waits when full
+    queue_size: int = 100
+    # seconds to wait for the rest of an album
+    album_wait: float = 1.0
+
+    model_config = SettingsConfigDict(env_prefix="crosspost_")
+
+
+class MonitorConfig(Settings):
+    enable: bool = False
+    # seconds between event loop heartbeats
+    interval: float = 1.0
+    # a heartbeat late by this many seconds is a stall, its stack is logged
+    threshold: float = 0.5
+    # minutes between lag summaries in the log, 0 to disable
+    report_minutes: int = 10
+
+    model_config = SettingsConfigDict(env_prefix="monitor_")
+
+
+LabelAction = Literal["spoiler", "hide", "skip"]
+
+
+class LabelsConfig(Settings):
+    # labelers whose labels apply to every post
+    labelers: List[str] = ["did:plc:ar7c4by46qjdydhdevvrndac"]
+    # labels authors put on their own posts apply as well
+    self_labels: bool = True
+    # label value -> action, spoiler blurs media, hide also blurs the text
+    actions: Dict[str, LabelAction] = {
+        "porn": "spoiler",
+        "sexual": "spoiler",
+        "graphic-media": "spoiler",
+        "nudity": "spoiler",
+    }
+    # labeler did -> label value -> action, on top of `actions`, as json
+    labeler_actions: Dict[str, Dict[str, LabelAction]] = {}
+
+    model_config = SettingsConfigDict(env_prefix="labels_")
+
+
 class ApplicationConfig(Settings):
     bot: BotConfig = BotConfig()
     push: PushConfig = PushConfig()
     bsky: BskyConfig = BskyConfig()
+    feeds: FeedsConfig = FeedsConfig()
+    digest: DigestConfig = DigestConfig()
+    log: LogConfig = LogConfig()
+    media: MediaConfig = MediaConfig()
+    queue: QueueConfig = QueueConfig()
+    cluster: ClusterConfig = ClusterConfig()
+    refresh: RefreshConfig = RefreshConfig()
+    crosspost: CrosspostConfig = CrosspostConfig()
+    monitor: MonitorConfig = MonitorConfig()
+    labels: LabelsConfig = LabelsConfig()
     cache_uri: str = "mem://"
 
 
@@ -18,7 +18,7 @@ class TelegramBot(AsyncInitializingComponent):
 
     async def initialize(self):
         await self.bot.start()
-        logs.info(f"Telegram bot started, As @{self.bot.me.username}")
+        logs.info("Telegram bot started, As @%s", self.bot.me.username)
 
     async def shutdown(self):
         try:
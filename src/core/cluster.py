@@ -0,0 +1,13 @@
+from persica.factory.component import AsyncInitializingComponent
+
+from src.defs.cluster import cluster
+
+
+class ClusterCoordinator(AsyncInitializingComponent):
+    def __init__(self):
+        self.cluster = cluster
+
+    async def shutdown(self):
+        # hand the leader lease over right away instead of letting it expire
+        if self.cluster.enabled:
+            await self.cluster.resign()
@@ -0,0 +1,16 @@
+from persica.factory.component import AsyncInitializingComponent
+
+from src.config import config
+from src.utils.loop_monitor import loop_monitor
+
+
+class LoopMonitorComponent(AsyncInitializingComponent):
+    def __init__(self):
+        self.monitor = loop_monitor
+
+    async def initialize(self):
+        if config.monitor.enable:
+            self.monitor.start()
+
+    async def shutdown(self):
+        self.monitor.stop()
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+import ujson
+from pydantic import BaseModel
+from pyrogram import Client
+
+from src.core.bsky import BskyClient
+from src.defs.cache import PostCache
+from src.defs.labels import label_policy
+from src.defs.message_index import message_index
+from src.defs.render import HumanPost
+from src.defs.timeline import Timeline, send_budget
+from src.utils.log import logs, post_logs
+from src.utils.path import DATA_PATH, atomic_write
+
+BACKFILL_PATH = DATA_PATH / "backfill"
+# getAuthorFeed maximum
+PAGE_LIMIT = 100
+# pages fetched ahead of the sender
+PREFETCH_PAGES = 2
+
+Page = Union[tuple[list[HumanPost], Optional[str]], Exception]
+
+
+class BackfillState(BaseModel):
+    did: str
+    handle: str
+    # cursor of the first page not fully sent yet
+    cursor: Optional[str] = None
+    # last handled post of that page, the checkpoint moves after every post
+    last_uri: Optional[str] = None
+    sent: int = 0
+    skipped: int = 0
+    failed: int = 0
+    # posts count of the profile, for the eta
+    total: int = 0
+    done: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.skipped + self.failed
+
+
+class Backfill:
+    """
+    Forwards the post history of one author, newest first. Pages are
+    fetched ahead while the previous page is sent through the shared
+    telegram budget, the position is checkpointed after every post.
+    """
+
+    def __init__(
+        self,
+        client: BskyClient,
+        bot: Client,
+        state: BackfillState,
+        persist_index: bool = True,
+    ):
+        self.client = client
+        self.bot = bot
+        self.state = state
+        # off when another process owns the message index file
+        self.persist_index = persist_index
+        self.queue: asyncio.Queue[Page] = asyncio.Queue(PREFETCH_PAGES)
+        self.started = 0.0
+        # processed before this run, excluded from the throughput
+        self.resumed = state.processed
+
+    @staticmethod
+    def get_path(did: str) -> Path:
+        return BACKFILL_PATH / f"{did.replace(':', '_')}.json"
+
+    @staticmethod
+    def load(did: str) -> Optional[BackfillState]:
+        try:
+            with open(Backfill.get_path(did), encoding="UTF-8") as f:
+                return BackfillState(**ujson.load(f))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logs.warning("[backfill] Broken checkpoint file, ignored: %s", did)
+            return None
+
+    @staticmethod
+    async def open(
+        client: BskyClient, bot: Client, actor: str, persist_index: bool = True
+    ) -> "Backfill":
+        """Starts or resumes the backfill of a handle or did."""
+        profile = await client.client.get_profile(actor)
+        state = Backfill.load(profile.did) or BackfillState(
+            did=profile.did, handle=profile.handle
+        )
+        state.total = profile.posts_count or 0
+        return Backfill(client, bot, state, persist_index)
+
+    async def save(self) -> None:
+        data = self.state.model_dump_json()
+        path = Backfill.get_path(self.state.did)
+
+        def write():
+            BACKFILL_PATH.mkdir(exist_ok=True)
+            atomic_write(path, data)
+
+        await asyncio.to_thread(write)
+
+    @property
+    def rate(self) -> float:
+        """Posts per second in this run."""
+        elapsed = time.monotonic() - self.started
+        if not self.started or elapsed <= 0:
+            return 0.0
+        return (self.state.processed - self.resumed) / elapsed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left, estimated from the posts count of the profile."""
+        if self.state.done:
+            return 0.0
+        rate = self.rate
+        if not rate:
+            return None
+        return max(0, self.state.total - self.state.processed) / rate
+
+    @property
+    def progress(self) -> str:
+        state = self.state
+        eta = self.eta
+        eta_str = "未知" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+        if eta is not None and eta >= 86400:
+            eta_str = f"{int(eta // 86400)} 天 {eta_str}"
+        return (
+            f"@{state.handle}：{'已完成' if state.done else '进行中'}\n"
+            f"已发送 {state.sent}，跳过 {state.skipped}，失败 {state.failed}，"
+            f"共约 {state.total} 条\n"
+            f"速度 {self.rate * 60:.1f} 条/分钟，预计剩余 {eta_str}"
+        )
+
+    async def fetch(
+        self, cursor: Optional[str]
+    ) -> tuple[list[HumanPost], Optional[str]]:
+        data = await self.client.client.get_author_feed(
+            self.state.did,
+            cursor=cursor,
+            filter="posts_and_author_threads",
+            limit=PAGE_LIMIT,
+        )
+        posts = []
+        for item in data.feed:
+            # reposts belong to other authors, a pinned post comes again in order
+            if item.reason or label_policy.skips(item.post):
+                continue
+            try:
+                posts.append(HumanPost.parse(item))
+            except Exception as e:
+                post_logs.error(
+                    "Error when parsing post: %s , %s", item.post.uri, str(e)
+                )
+        return posts, data.cursor if data.feed else None
+
+    async def produce(self) -> None:
+        cursor = self.state.cursor
+        while True:
+            try:
+                posts, cursor = await self.fetch(cursor)
+            except Exception as e:
+                await self.queue.put(e)
+                return
+            await self.queue.put((posts, cursor))
+            if not cursor:
+                return
+
+    def unsent(self, posts: list[HumanPost]) -> list[HumanPost]:
+        """Drops the posts of a resumed page handled before the checkpoint."""
+        uris = [post.uri for post in posts]
+        if self.state.last_uri not in uris:
+            return posts
+        return posts[uris.index(self.state.last_uri) + 1 :]
+
+    async def send(self, post: HumanPost) -> None:
+        # sent by the timeline, or before an interrupted checkpoint
+        if await PostCache.get(post):
+            self.state.skipped += 1
+            return
+        try:
+            await send_budget.acquire()
+            message = await Timeline.send_post(self.bot, post)
+            await PostCache.set(post)
+            label_policy.count(post.label_action)
+            if message:
+                message_index.set(post.uri, message.id)
+            self.state.sent += 1
+            post_logs.debug("Backfilled post: %s", post.url)
+        except Exception as e:
+            self.state.failed += 1
+            post_logs.error("Error when backfilling post: %s , %s", post.url, str(e))
+
+    async def run(
+        self, on_progress: Optional[Callable[["Backfill"], Awaitable[None]]] = None
+    ) -> None:
+        if self.state.done:
+            return
+        self.started = time.monotonic()
+        producer = asyncio.create_task(self.produce())
+        try:
+            while not self.state.done:
+                page = await self.queue.get()
+                if isinstance(page, Exception):
+                    raise page
+                posts, cursor = page
+                for post in self.unsent(posts):
+                    await self.send(post)
+                    self.state.last_uri = post.uri
+                    await self.save()
+                self.state.cursor = cursor
+                self.state.last_uri = None
+                self.state.done = cursor is None
+                await self.save()
+                if self.persist_index:
+                    await message_index.flush()
+                else:
+                    await message_index.share()
+                logs.info(
+                    "[backfill] @%s: %s/%s posts, %.1f posts/min, eta %s s",
+                    self.state.handle,
+                    self.state.processed,
+                    self.state.total,
+                    self.rate * 60,
+                    "?" if self.eta is None else int(self.eta),
+                )
+                if on_progress:
+                    await on_progress(self)
+        finally:
+            producer.cancel()
@@ -1,3 +1,4 @@
+import asyncio
 import html
 import re
 from httpx import AsyncClient
@@ -8,6 +9,7 @@ from atproto import models
 from pyrogram.parser import utils
 
 from src.utils.log import logs
+from src.utils.lru import LRUCache
 
 
 class ParserModel(models.AppBskyRichtextFacet.Main):
@@ -31,7 +33,7 @@ class ParserModel(models.AppBskyRichtextFacet.Main):
 
 
 class Parser(HTMLParser):
-    MENTION_RE = re.compile(r"bsky\.app/profile/([^/]+)")
+    MENTION_RE = re.compile(r"^https?://bsky\.app/profile/([^/?#]+)/?$")
 
     def __init__(self):
         super().__init__()
@@ -94,28 +96,43 @@ class Parser(HTMLParser):
 
 
 class HTML:
-    def __init__(self):
+    def __init__(self, base_url: str = "https://bsky.social/xrpc"):
         self.client = AsyncClient()
+        self.base_url = base_url
+        # handle -> did, failed lookups are not cached
+        self.dids: LRUCache[str] = LRUCache(1024)
 
     async def resolve_peer(self, handle: str) -> Optional[str]:
+        did = self.dids.get(handle)
+        if did:
+            return did
         try:
             req = await self.client.get(
-                "https://bsky.social/xrpc/com.atproto.identity.resolveHandle",
+                f"{self.base_url}/com.atproto.identity.resolveHandle",
                 params={"handle": handle},
                 timeout=10,
             )
             req.raise_for_status()
-            return req.json()["did"]
+            did = req.json()["did"]
         except Exception:
             return None
+        self.dids.set(handle, did)
+        return did
+
+    async def resolve_peers(self, handles: set[str]) -> dict[str, Optional[str]]:
+        """Resolves every handle of a message at once."""
+        handles = list(handles)
+        dids = await asyncio.gather(*[self.resolve_peer(h) for h in handles])
+        return dict(zip(handles, dids))
 
     async def parse(self, text: str) -> dict:
         # Strip whitespaces from the beginning and the end, but preserve closing tags
         text = re.sub(r"^\s*(<[\w<>=\s\"]*>)\s*", r"\1", text)
         text = re.sub(r"\s*(</[\w</>]*>)\s*$", r"\1", text)
 
+        # facet offsets count utf-8 bytes, so no surrogates unlike telegram
         parser = Parser()
-        parser.feed(utils.add_surrogates(text))
+        parser.feed(text)
         parser.close()
 
         if parser.tag_entities:
@@ -126,13 +143,22 @@ class HTML:
 
             logs.info("Unclosed tags: %s", ", ".join(unclosed_tags))
 
+        dids = await self.resolve_peers(
+            {
+                fact.features[0].did
+                for fact in parser.facts
+                if isinstance(fact.features[0], models.AppBskyRichtextFacet.Mention)
+                and not fact.features[0].did.startswith("did:")
+            }
+        )
+
         entities = []
 
         for fact in parser.facts:
             entity = fact.features[0]
             if isinstance(entity, models.AppBskyRichtextFacet.Mention):
-                if not entity.did.startswith("did:plc:"):
-                    did = await self.resolve_peer(entity.did)
+                if not entity.did.startswith("did:"):
+                    did = dids.get(entity.did)
                     if did:
                         entity = models.AppBskyRichtextFacet.Mention(did=did)
                     else:
@@ -148,7 +174,7 @@ class HTML:
         facets = [fact.get_origin() for fact in entities] if entities else None
 
         return {
-            "message": utils.remove_surrogates(parser.text),
+            "message": parser.text,
             "facets": facets,
         }
 
@@ -18,3 +18,8 @@ class PostCache:
     @staticmethod
     async def get(post: HumanPost) -> bool:
         return await cache.get(PostCache.key(post)) is not None
+
+    @staticmethod
+    async def set_cid(cid: str):
+        """Marks a post by cid, e.g. one the bot created itself."""
+        await cache.set("post:" + cid, "1", expire=60 * 60 * 24 * 7)
@@ -0,0 +1,199 @@
+import os
+import socket
+import time
+from typing import Callable, Container
+
+from cashews import cache
+
+from src.config import config
+from src.defs.cache import PostCache
+from src.defs.render import HumanPost
+from src.utils.log import logs
+
+
+class Cluster:
+    """
+    Coordinates replicas sharing one cache backend. A leased leader lock
+    makes only one replica poll bsky; fetched posts are published as
+    pending for every replica, and each post is claimed with
+    set-if-not-exists before it is sent, so it goes out exactly once.
+    Pending posts are listed in one index entry, so polling them never
+    scans the keyspace.
+    """
+
+    LEADER_KEY = "cluster:leader"
+    PENDING_KEY = "cluster:pending"
+    PENDING_LOCK = "cluster:pending:lock"
+    POST_PREFIX = "cluster:post:"
+    CLAIM_PREFIX = "cluster:claim:"
+
+    def __init__(self, replica_id: str = ""):
+        self.replica_id = replica_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+
+    @property
+    def enabled(self) -> bool:
+        return config.cluster.enable
+
+    async def heartbeat(self) -> bool:
+        """Takes the leader lease if it is free, renews it if it is ours."""
+        lease = config.cluster.lease
+        if await cache.set_lock(self.LEADER_KEY, self.replica_id, expire=lease):
+            leader = True
+        else:
+            leader = await self.renew(lease)
+        if leader != self.is_leader:
+            logs.info(
+                "[cluster] %s is %s the leader",
+                self.replica_id,
+                "now" if leader else "no longer",
+            )
+        self.is_leader = leader
+        return leader
+
+    async def renew(self, lease: int) -> bool:
+        """Extends the leader lease if this replica still holds it."""
+        owner = await cache.get_raw(self.LEADER_KEY)
+        if isinstance(owner, bytes):
+            owner = owner.decode()
+        if owner != self.replica_id:
+            return False
+        # unlock only deletes the lease while it is ours, another replica
+        # taking it in between just wins the next term
+        if not await cache.unlock(self.LEADER_KEY, self.replica_id):
+            return False
+        return await cache.set_lock(self.LEADER_KEY, self.replica_id, expire=lease)
+
+    async def resign(self) -> None:
+        if self.is_leader:
+            await cache.unlock(self.LEADER_KEY, self.replica_id)
+            self.is_leader = False
+
+    async def update_pending(self, change: Callable[[dict], None]) -> None:
+        """Edits the pending index under its lock, expired entries dropped."""
+        async with cache.lock(self.PENDING_LOCK, expire=10, check_interval=0.05):
+            now = time.time()
+            index = {
+                key: entry
+                for key, entry in (await cache.get(self.PENDING_KEY) or {}).items()
+                if entry[1] > now
+            }
+            change(index)
+            await cache.set(self.PENDING_KEY, index, expire=config.cluster.pending_ttl)
+
+    async def publish(self, posts: list[HumanPost]) -> None:
+        if not posts:
+            return
+        await cache.set_many(
+            {
+                self.POST_PREFIX + PostCache.key(post): post.model_dump_json()
+                for post in posts
+            },
+            expire=config.cluster.pending_ttl,
+        )
+        # key -> [failed attempts, expiry]
+        entry = [0, time.time() + config.cluster.pending_ttl]
+
+        def add(index: dict):
+            for post in posts:
+                index.setdefault(PostCache.key(post), list(entry))
+
+        await self.update_pending(add)
+
+    async def pending(self, skip: Container[str] = ()) -> list[HumanPost]:
+        """Posts published by the leader and not sent yet, oldest first."""
+        index = await cache.get(self.PENDING_KEY) or {}
+        now = time.time()
+        keys = [
+            key for key, entry in index.items() if entry[1] > now and key not in skip
+        ]
+        if not keys:
+            return []
+        values = await cache.get_many(*(self.POST_PREFIX + key for key in keys))
+        posts = [HumanPost.model_validate_json(v) for v in values if v is not None]
+        posts.sort(key=lambda p: p.created_at)
+        return posts
+
+    async def forget(self, posts: list[HumanPost]) -> None:
+        """Takes sent posts off the pending index."""
+        if not self.enabled or not posts:
+            return
+        keys = [PostCache.key(post) for post in posts]
+
+        def remove(index: dict):
+            for key in keys:
+                index.pop(key, None)
+
+        await self.update_pending(remove)
+        await cache.delete_many(*(self.POST_PREFIX + key for key in keys))
+
+    async def settle(self, posts: list[HumanPost]) -> None:
+        """
+        Forgets the posts of a finished batch that went out. Failed ones are
+        given back for another replica to try, until max_attempts sends
+        failed, then they are marked as sent so nobody tries again.
+        """
+        if not self.enabled or not posts:
+            return
+        sent, failed = [], {}
+        for post in posts:
+            if await PostCache.get(post):
+                sent.append(post)
+            else:
+                failed[PostCache.key(post)] = post
+        await self.forget(sent)
+        if not failed:
+            return
+        given_up = []
+
+        def count(index: dict):
+            for key, post in failed.items():
+                entry = index.get(key)
+                if entry is None:
+                    continue
+                entry[0] += 1
+                if entry[0] >= config.cluster.max_attempts:
+                    index.pop(key)
+                    given_up.append(post)
+
+        await self.update_pending(count)
+        for post in given_up:
+            logs.warning(
+                "[cluster] Giving up on %s after %s failed sends",
+                post.url,
+                config.cluster.max_attempts,
+            )
+            failed.pop(PostCache.key(post))
+            await PostCache.set(post)
+        for post in failed.values():
+            await self.release(post)
+
+    async def claim(self, post: HumanPost) -> bool:
+        return await cache.set_lock(
+            self.CLAIM_PREFIX + PostCache.key(post),
+            self.replica_id,
+            expire=config.cluster.claim_ttl,
+        )
+
+    async def claim_many(self, posts: list[HumanPost]) -> list[HumanPost]:
+        if not self.enabled:
+            return posts
+        claimed, sent = [], []
+        for post in posts:
+            if not await self.claim(post):
+                continue
+            # a claim only lives for claim_ttl, the sent mark is what lasts
+            if await PostCache.get(post):
+                sent.append(post)
+                continue
+            claimed.append(post)
+        await self.forget(sent)
+        return claimed
+
+    async def release(self, post: HumanPost) -> None:
+        """Gives a claimed post back after a failed send."""
+        if self.enabled:
+            await cache.unlock(self.CLAIM_PREFIX + PostCache.key(post), self.replica_id)
+
+
+cluster = Cluster(config.cluster.replica_id)
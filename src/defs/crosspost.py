@@ -0,0 +1,143 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+from atproto import models
+from pyrogram import Client
+from pyrogram.types import Message
+
+from src.config import config
+from src.core.bsky import BskyClient
+from src.defs.bsky_richtext import HTML, bsky_html_parser
+from src.defs.cache import PostCache
+from src.defs.media import media_processor
+from src.utils.log import logs
+
+if TYPE_CHECKING:
+    from atproto_client.models.blob_ref import BlobRef
+
+# bsky limits of one post
+MAX_IMAGES = 4
+MAX_LENGTH = 300
+BLOB_MAX_BYTES = 1_000_000
+BLOB_MAX_SIDE = 2000
+
+
+class Crossposter:
+    """
+    Posts messages of the crosspost chat to bsky. Albums are collected into
+    one post, message groups wait in a bounded queue and are posted in order
+    by a single worker, the images of one post are transferred concurrently.
+    """
+
+    def __init__(self, parser: HTML, maxsize: int = 100, album_wait: float = 1.0):
+        self.parser = parser
+        self.album_wait = album_wait
+        self.queue: asyncio.Queue[list[Message]] = asyncio.Queue(maxsize)
+        # media_group_id -> messages received so far
+        self.albums: dict[str, list[Message]] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.posted = 0
+        self.failed = 0
+
+    async def put(self, message: Message) -> None:
+        """Queues a message, waits while the queue is full."""
+        if not message.media_group_id:
+            await self.queue.put([message])
+            return
+        album = self.albums.get(message.media_group_id)
+        if album is not None:
+            album.append(message)
+            return
+        self.albums[message.media_group_id] = [message]
+        task = asyncio.create_task(self.put_album(message.media_group_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def put_album(self, media_group_id: str) -> None:
+        await asyncio.sleep(self.album_wait)
+        album = self.albums.pop(media_group_id)
+        await self.queue.put(sorted(album, key=lambda m: m.id))
+
+    @staticmethod
+    def truncate(
+        text: str, facets: Optional[list["models.AppBskyRichtextFacet.Main"]]
+    ) -> tuple[str, Optional[list["models.AppBskyRichtextFacet.Main"]]]:
+        if len(text) <= MAX_LENGTH:
+            return text, facets
+        text = text[: MAX_LENGTH - 1]
+        end = len(text.encode("utf-8"))
+        if facets:
+            facets = [fact for fact in facets if fact.index.byte_end <= end] or None
+        return text + "…", facets
+
+    async def upload_photo(
+        self, client: BskyClient, bot: Client, message: Message
+    ) -> Optional["BlobRef"]:
+        try:
+            data = (await bot.download_media(message, in_memory=True)).getvalue()
+            if len(data) > BLOB_MAX_BYTES:
+                data = await media_processor.shrink_photo(
+                    data, BLOB_MAX_BYTES, BLOB_MAX_SIDE
+                )
+            return (await client.client.upload_blob(data)).blob
+        except Exception as e:
+            logs.warning("[crosspost] Photo upload failed: %s , %s", message.id, str(e))
+            return None
+
+    async def post(
+        self, client: BskyClient, bot: Client, messages: list[Message]
+    ) -> Optional[str]:
+        """Posts one message or album, returns the uri of the bsky post."""
+        text = next(
+            (m.text or m.caption for m in messages if m.text or m.caption), None
+        )
+        message, facets = "", None
+        if text:
+            data = await self.parser.parse(text.html)
+            message, facets = Crossposter.truncate(data["message"], data["facets"])
+        photos = [m for m in messages if m.photo]
+        if len(photos) > MAX_IMAGES:
+            logs.warning(
+                "[crosspost] Only the first %s of %s photos are posted",
+                MAX_IMAGES,
+                len(photos),
+            )
+        blobs = await asyncio.gather(
+            *[self.upload_photo(client, bot, m) for m in photos[:MAX_IMAGES]]
+        )
+        images = [
+            models.AppBskyEmbedImages.Image(alt="", image=blob)
+            for blob in blobs
+            if blob
+        ]
+        if not message and not images:
+            # stickers, polls and such have nothing to post
+            return None
+        embed = models.AppBskyEmbedImages.Main(images=images) if images else None
+        created = await client.client.send_post(message, embed=embed, facets=facets)
+        # the own post shows up on the timeline, do not forward it back
+        await PostCache.set_cid(created.cid)
+        return created.uri
+
+    async def run(self, client: BskyClient, bot: Client) -> None:
+        while True:
+            messages = await self.queue.get()
+            try:
+                uri = await self.post(client, bot, messages)
+                if uri:
+                    self.posted += 1
+                    logs.info("[crosspost] Posted message %s: %s", messages[0].id, uri)
+            except Exception as e:
+                self.failed += 1
+                logs.error(
+                    "[crosspost] Error when posting message %s: %s",
+                    messages[0].id,
+                    str(e),
+                )
+            finally:
+                self.queue.task_done()
+
+
+crossposter = Crossposter(
+    bsky_html_parser, config.crosspost.queue_size, config.crosspost.album_wait
+)
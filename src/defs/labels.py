@@ -0,0 +1,83 @@
+from collections import Counter
+from typing import TYPE_CHECKING, Optional
+
+from src.config import LabelsConfig, config
+from src.utils.lru import LRUCache
+
+if TYPE_CHECKING:
+    from atproto_client.models.com.atproto.label.defs import Label
+    from atproto_client.models.app.bsky.feed.defs import PostView
+
+# a post with several labels gets the strongest action
+SEVERITY = {"spoiler": 1, "hide": 2, "skip": 3}
+
+
+class LabelPolicy:
+    """
+    Decides what to do with labelled posts. The rules are compiled once
+    into dict lookups keyed by labeler did, then by label value.
+    """
+
+    def __init__(self, labels: LabelsConfig):
+        self.self_labels = labels.self_labels
+        # rules used for the author's own labels
+        self.actions: dict[str, str] = dict(labels.actions)
+        self.rules: dict[str, dict[str, str]] = {
+            did: self.actions for did in labels.labelers
+        }
+        for did, actions in labels.labeler_actions.items():
+            self.rules[did] = {**self.actions, **actions}
+        self.trusted = frozenset(self.rules)
+        self.counters: Counter[str] = Counter()
+        # skipped posts come again on every poll, each is counted once
+        self.skipped: LRUCache[bool] = LRUCache(4096)
+
+    def get_rules(self, src: str, author: str) -> Optional[dict[str, str]]:
+        rules = self.rules.get(src)
+        if rules is None and self.self_labels and src == author:
+            return self.actions
+        return rules
+
+    def trusted_values(self, labels: Optional[list["Label"]], author: str) -> list[str]:
+        """Values of the labels put by trusted labelers."""
+        if not labels:
+            return []
+        return [
+            label.val
+            for label in labels
+            if not label.neg and self.get_rules(label.src, author) is not None
+        ]
+
+    def decide(self, labels: Optional[list["Label"]], author: str) -> Optional[str]:
+        if not labels:
+            return None
+        action = None
+        for label in labels:
+            if label.neg:
+                continue
+            rules = self.get_rules(label.src, author)
+            found = rules.get(label.val) if rules else None
+            if found and (action is None or SEVERITY[found] > SEVERITY[action]):
+                action = found
+        return action
+
+    def skips(self, post: "PostView") -> bool:
+        """Checked on the raw view, before any parsing or rendering."""
+        if not post.labels:
+            return False
+        if self.decide(post.labels, post.author.did) == "skip":
+            if self.skipped.get(post.uri) is None:
+                self.skipped.set(post.uri, True)
+                self.counters["skip"] += 1
+            return True
+        return False
+
+    def count(self, action: Optional[str]) -> None:
+        if action:
+            self.counters[action] += 1
+
+    def summary(self) -> str:
+        return ", ".join(f"{action} {self.counters[action]}" for action in SEVERITY)
+
+
+label_policy = LabelPolicy(config.labels)
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from httpx import AsyncClient
+
+from src.config import config
+from src.utils.log import logs
+from src.utils.path import DATA_PATH, atomic_write
+
+MEDIA_PATH = DATA_PATH / "media"
+MEDIA_PATH.mkdir(exist_ok=True)
+# formats telegram accepts as photos, and the file extension they keep
+PHOTO_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+PHOTO_MAX_SIDE_SUM = 10000
+PHOTO_MAX_RATIO = 20
+# refuse to decode anything bigger, guards against decompression bombs
+MAX_IMAGE_PIXELS = 100_000_000
+CID_RE = re.compile(r"/(baf[a-z0-9]{20,})(?:@|$|\?)")
+
+
+def blob_cid(url: str) -> str:
+    """The blob cid in a bsky cdn url, or a stable hash for other urls."""
+    match = CID_RE.search(url)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def need_convert(
+    fmt: Optional[str], width: int, height: int, size: int, max_bytes: int
+) -> bool:
+    if fmt not in PHOTO_FORMATS or size > max_bytes:
+        return True
+    if width + height > PHOTO_MAX_SIDE_SUM:
+        return True
+    return max(width, height) > PHOTO_MAX_RATIO * min(width, height)
+
+
+def convert_photo(data: bytes, out: str, max_bytes: int, max_side: int) -> str:
+    """
+    Runs in a worker process. Writes a telegram-compatible photo to `out`
+    plus the extension of its format and returns that path, re-encoding as
+    jpeg only when the original does not fit the limits.
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    with Image.open(io.BytesIO(data)) as img:
+        if not need_convert(img.format, img.width, img.height, len(data), max_bytes):
+            path = out + PHOTO_FORMATS[img.format]
+            atomic_write(path, data)
+            return path
+        img.seek(0)
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            frame = Image.new("RGB", rgba.size, (255, 255, 255))
+            frame.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            frame = img.convert("RGB")
+    # crop extreme panoramas to the maximum aspect ratio
+    width, height = frame.size
+    if width > PHOTO_MAX_RATIO * height:
+        left = (width - PHOTO_MAX_RATIO * height) // 2
+        frame = frame.crop((left, 0, left + PHOTO_MAX_RATIO * height, height))
+    elif height > PHOTO_MAX_RATIO * width:
+        top = (height - PHOTO_MAX_RATIO * width) // 2
+        frame = frame.crop((0, top, width, top + PHOTO_MAX_RATIO * width))
+    frame.thumbnail((max_side, max_side))
+    quality = 90
+    while True:
+        buffer = io.BytesIO()
+        frame.save(buffer, "JPEG", quality=quality, optimize=True)
+        if buffer.tell() <= max_bytes or quality <= 40:
+            break
+        quality -= 15
+    path = out + PHOTO_FORMATS["JPEG"]
+    atomic_write(path, buffer.getvalue())
+    return path
+
+
+def prune_files(path: Path, max_bytes: int) -> int:
+    """
+    Deletes the least recently used files in `path` until the rest fit in
+    `max_bytes`, returns the size left.
+    """
+    files = []
+    for entry in os.scandir(path):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, file in sorted(files):
+        if total <= max_bytes:
+            break
+        Path(file).unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+class MediaProcessor:
+    """
+    Downloads media telegram could not fetch by url and makes it sendable.
+    CPU-heavy work runs in a bounded process pool, results are cached on
+    disk by blob cid, up to media cache_mb.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.client = AsyncClient(follow_redirects=True)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # bounds in-flight downloads, so memory stays under workers * max_download
+        self.semaphore = asyncio.Semaphore(config.media.workers)
+        # bytes in the cache directory, known after the first prune
+        self.size: Optional[int] = None
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            # forking would copy the locks of the log listener and other threads
+            self.pool = ProcessPoolExecutor(
+                max_workers=config.media.workers,
+                max_tasks_per_child=50,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.pool
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def download(self, url: str) -> Optional[bytes]:
+        limit = config.media.max_download
+        try:
+            async with self.client.stream("GET", url, timeout=30) as req:
+                req.raise_for_status()
+                if int(req.headers.get("content-length") or 0) > limit:
+                    return None
+                data = bytearray()
+                async for chunk in req.aiter_bytes():
+                    data += chunk
+                    if len(data) > limit:
+                        return None
+                return bytes(data)
+        except Exception as e:
+            logs.warning("[media] Download failed: %s , %s", url, str(e))
+            return None
+
+    async def track(self, path: str) -> None:
+        """Counts a new cached file, pruning the cache once it is full."""
+        limit = config.media.cache_mb * 1024 * 1024
+        if not limit:
+            return
+        if self.size is not None:
+            self.size += os.path.getsize(path)
+            if self.size <= limit:
+                return
+            # leaves some room, so not every new file triggers a prune
+            limit = limit * 9 // 10
+        self.size = await asyncio.to_thread(prune_files, self.path, limit)
+
+    @staticmethod
+    def hit(out: Path) -> bool:
+        """Whether a cached file exists, marking it as recently used."""
+        try:
+            os.utime(out)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def cached_photo(self, cid: str) -> Optional[str]:
+        for ext in PHOTO_FORMATS.values():
+            out = self.path / f"{cid}{ext}"
+            if self.hit(out):
+                return str(out)
+        return None
+
+    async def process_photo(self, data: bytes, cid: str) -> str:
+        cached = self.cached_photo(cid)
+        if cached:
+            return cached
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(
+            self.get_pool(),
+            convert_photo,
+            data,
+            str(self.path / cid),
+            config.media.photo_max_bytes,
+            config.media.photo_max_side,
+        )
+        await self.track(path)
+        return path
+
+    async def shrink_photo(self, data: bytes, max_bytes: int, max_side: int) -> bytes:
+        """Re-encodes a photo that does not fit the given limits."""
+        out = self.path / f"{hashlib.sha1(data).hexdigest()}.shrink"
+        loop = asyncio.get_running_loop()
+        out = Path(
+            await loop.run_in_executor(
+                self.get_pool(), convert_photo, data, str(out), max_bytes, max_side
+            )
+        )
+        try:
+            return await asyncio.to_thread(out.read_bytes)
+        finally:
+            out.unlink(missing_ok=True)
+
+    async def prepare_photo(self, url: str) -> Optional[str]:
+        cid = blob_cid(url)
+        cached = self.cached_photo(cid)
+        if cached:
+            return cached
+        async with self.semaphore:
+            data = await self.download(url)
+            if data is None:
+                return None
+            try:
+                return await self.process_photo(data, cid)
+            except Exception as e:
+                logs.warning("[media] Convert failed: %s , %s", url, str(e))
+                return None
+
+    async def prepare_animation(self, url: str) -> Optional[str]:
+        out = self.path / f"{blob_cid(url)}.gif"
+        if self.hit(out):
+            return str(out)
+        async with self.semaphore:
+            data = await self.download(url)
+        if data is None:
+            return None
+        await asyncio.to_thread(atomic_write, out, data)
+        await self.track(str(out))
+        return str(out)
+
+    async def prepare_images(self, urls: list[str]) -> list[str]:
+        """Local files for the given images, keeping the url when one fails."""
+        paths = await asyncio.gather(*[self.prepare_photo(url) for url in urls])
+        return [path or url for path, url in zip(paths, urls)]
+
+
+media_processor = MediaProcessor(MEDIA_PATH)
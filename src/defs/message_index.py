@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import ujson
+from cashews import cache
+
+from src.config import config
+from src.utils.log import logs
+from src.utils.path import DATA_PATH, atomic_write
+
+
+class MessageIndex:
+    """
+    Maps bsky post uris to the telegram message id they were delivered as,
+    so replies can be threaded instead of re-quoting their parent.
+    Bounded by size, entries expire after ttl seconds, persisted as json.
+    With the cluster enabled, entries are shared through the cache too.
+    """
+
+    SHARED_PREFIX = "cluster:message:"
+
+    def __init__(self, path: Path, maxsize: int = 20000, ttl: int = 60 * 60 * 24 * 7):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        # set since the last share
+        self.unshared: dict[str, int] = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="UTF-8") as f:
+                items = ujson.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logs.warning("[index] Broken message index file, ignored: %s", self.path)
+            return
+        now = time.time()
+        self.data.clear()
+        for uri, message_id, expire in items:
+            if expire > now:
+                self.data[uri] = (message_id, expire)
+        self.trim()
+
+    def dumps(self) -> str:
+        return ujson.dumps([[k, v[0], v[1]] for k, v in self.data.items()])
+
+    async def flush(self) -> None:
+        await self.share()
+        data = self.dumps()
+        await asyncio.to_thread(atomic_write, self.path, data)
+
+    def trim(self) -> None:
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def get(self, uri: str) -> Optional[int]:
+        item = self.data.get(uri)
+        if item is None:
+            return None
+        message_id, expire = item
+        if expire <= time.time():
+            self.data.pop(uri, None)
+            return None
+        return message_id
+
+    def set(self, uri: str, message_id: int, shared: bool = False) -> None:
+        self.data[uri] = (message_id, time.time() + self.ttl)
+        self.data.move_to_end(uri)
+        self.trim()
+        if config.cluster.enable and not shared:
+            self.unshared[uri] = message_id
+
+    async def share(self) -> None:
+        """Publishes new entries to the other replicas."""
+        if not self.unshared:
+            return
+        pairs = {self.SHARED_PREFIX + uri: mid for uri, mid in self.unshared.items()}
+        self.unshared = {}
+        await cache.set_many(pairs, expire=self.ttl)
+
+    async def fetch(self, uris: list[str]) -> None:
+        """Looks up entries the other replicas shared."""
+        if not config.cluster.enable:
+            return
+        missing = [uri for uri in uris if self.get(uri) is None]
+        if not missing:
+            return
+        values = await cache.get_many(*(self.SHARED_PREFIX + uri for uri in missing))
+        for uri, message_id in zip(missing, values):
+            if message_id is not None:
+                self.set(uri, message_id, shared=True)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+message_index = MessageIndex(DATA_PATH / "message_index.json")
+message_index.load()
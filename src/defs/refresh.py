@@ -0,0 +1,113 @@
+import time
+
+from pyrogram import Client
+from pyrogram.enums import ParseMode
+from pyrogram.errors import BadRequest, FloodWait, MessageNotModified
+from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.config import config
+from src.core.bsky import BskyClient
+from src.defs.sent_messages import SentMessage, sent_messages
+from src.defs.timeline import Timeline, send_budget
+from src.utils.log import logs, post_logs
+
+# app.bsky.feed.getPosts accepts up to 25 uris
+GET_POSTS_LIMIT = 25
+
+
+class EngagementRefresher:
+    @staticmethod
+    def is_noticeable(old: tuple, new: tuple) -> bool:
+        for before, after in zip(old, new):
+            delta = abs(after - before)
+            if (
+                delta >= config.refresh.min_delta
+                and delta >= before * config.refresh.min_ratio
+            ):
+                return True
+        return False
+
+    @staticmethod
+    async def edit(bot: Client, message: SentMessage, counts: tuple):
+        text = message.body + Timeline.format_stats(*counts)
+        markup = None
+        if message.buttons:
+            markup = InlineKeyboardMarkup(
+                [
+                    [
+                        InlineKeyboardButton(label, url=url)
+                        for label, url in message.buttons
+                    ]
+                ]
+            )
+        if message.caption:
+            await bot.edit_message_caption(
+                config.push.chat_id,
+                message.message_id,
+                text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=markup,
+            )
+        else:
+            await bot.edit_message_text(
+                config.push.chat_id,
+                message.message_id,
+                text,
+                parse_mode=ParseMode.HTML,
+                disable_web_page_preview=True,
+                reply_markup=markup,
+            )
+
+    @staticmethod
+    async def refresh(client: BskyClient, bot: Client) -> int:
+        """Edits due messages whose counters changed, returns the edit count."""
+        if config.cluster.enable:
+            # messages other replicas sent
+            await sent_messages.sync()
+        now = time.time()
+        sent_messages.prune(now)
+        due = sent_messages.due(now)
+        edited = 0
+        try:
+            for idx in range(0, len(due), GET_POSTS_LIMIT):
+                chunk = due[idx : idx + GET_POSTS_LIMIT]
+                data = await client.client.get_posts([m.uri for m in chunk])
+                views = {view.uri: view for view in data.posts}
+                for message in chunk:
+                    view = views.get(message.uri)
+                    if view is None:
+                        # deleted or hidden since it was sent
+                        sent_messages.remove(message.uri)
+                        continue
+                    counts = (
+                        view.like_count or 0,
+                        view.quote_count or 0,
+                        view.reply_count or 0,
+                        view.repost_count or 0,
+                    )
+                    if EngagementRefresher.is_noticeable(message.counts, counts):
+                        if not send_budget.try_acquire(config.refresh.reserve):
+                            # new posts need the budget, the rest waits for the next run
+                            return edited
+                        try:
+                            await EngagementRefresher.edit(bot, message, counts)
+                            edited += 1
+                        except MessageNotModified:
+                            pass
+                        except BadRequest as e:
+                            post_logs.warning(
+                                "Message can not be refreshed: %s , %s",
+                                message.uri,
+                                str(e),
+                            )
+                            sent_messages.remove(message.uri)
+                            continue
+                        message.counts = counts
+                    message.checked_at = now
+        except FloodWait as e:
+            logs.warning("[refresh] FloodWait %s s, refresh postponed", e.value)
+        except Exception as e:
+            logs.error("[refresh] Error when refreshing counters: %s", str(e))
+        finally:
+            await sent_messages.flush()
+        return edited
@@ -14,6 +14,8 @@ from atproto_client.models.app.bsky.embed.record import (
 )
 
 from .bsky_richtext import bsky_html_parser
+from .labels import label_policy
+from src.utils.lru import LRUCache
 
 if TYPE_CHECKING:
     from atproto_client.models.app.bsky.feed.defs import (
@@ -28,7 +30,11 @@ if TYPE_CHECKING:
 
 TZ = pytz.timezone("Asia/Shanghai")
 XRPC_DOMAIN = "bsky.social"
-LABELERS = ["did:plc:ar7c4by46qjdydhdevvrndac"]
+# bump when the rendered html changes, so cached renders are not reused
+RENDER_VERSION = 1
+
+# a post cid is a hash of its record, so the rendered text of a cid never changes
+content_cache: LRUCache[str] = LRUCache(4096)
 
 
 class HumanAuthor(BaseModel):
@@ -115,6 +121,8 @@ class HumanPost(BaseModel, frozen=False):
     author: HumanAuthor
 
     labels: List[str]
+    # what the label policy decided for this post, if anything
+    label_action: Optional[str] = None
 
     is_quote: bool = False
     is_reply: bool = False
@@ -142,41 +150,33 @@ class HumanPost(BaseModel, frozen=False):
 
     @property
     def need_spoiler(self) -> bool:
-        return any(
-            label in ["porn", "sexual", "graphic-media", "nudity"]
-            for label in self.labels
-        )
+        return self.label_action in ("spoiler", "hide")
 
     @staticmethod
-    def parse_labels(
-        post: Union["PostView", "BskyViewRecordRecord"], author: HumanAuthor
-    ) -> List[str]:
-        labels = []
-        if not post.labels:
-            return labels
-        labelers = LABELERS.copy()
-        labelers.append(author.did)
-        for label in post.labels:
-            if label.src in labelers:
-                labels.append(label.val)
-        return labels
+    def render_content(cid: str, record) -> str:
+        key = (cid, RENDER_VERSION)
+        content = content_cache.get(key)
+        if content is None:
+            content = (
+                bsky_html_parser.unparse(record.text, record.facets)
+                if record.facets
+                else record.text
+            )
+            content_cache.set(key, content)
+        return content
 
     @staticmethod
     def parse_view(post: Union["PostView", "BskyViewRecordRecord"]) -> "HumanPost":
         record = post.value if isinstance(post, BskyViewRecordRecord) else post.record
         # author
         author = HumanAuthor.parse(post.author)
-        labels = HumanPost.parse_labels(post, author)
+        labels = label_policy.trusted_values(post.labels, author.did)
         embed = (
             (post.embeds[0] if post.embeds else None)
             if isinstance(post, BskyViewRecordRecord)
             else post.embed
         )
-        content = (
-            bsky_html_parser.unparse(record.text, record.facets)
-            if record.facets
-            else record.text
-        )
+        content = HumanPost.render_content(post.cid, record)
         created_at = record.created_at
         # images
         images = []
@@ -212,6 +212,7 @@ class HumanPost(BaseModel, frozen=False):
             uri=post.uri,
             author=author,
             labels=labels,
+            label_action=label_policy.decide(post.labels, author.did),
         )
 
     @staticmethod
@@ -223,7 +224,8 @@ class HumanPost(BaseModel, frozen=False):
             is_reply = True
             if hasattr(data.reply.parent, "record"):
                 parent_post = HumanPost.parse_view(data.reply.parent)
-        elif data.reason:
+        elif data.reason and getattr(data.reason, "by", None):
+            # feeds may also carry pin reasons, only reposts have an author
             is_repost = True
             repost_info = HumanRepostInfo(
                 by=HumanAuthor.parse(data.reason.by),
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from src.config import config
+from src.defs.cache import PostCache
+from src.defs.render import HumanPost
+
+
+class SendQueue:
+    """
+    Bounded queue of posts waiting to be sent, popped in priority order.
+    Priority is recomputed on every pop since posts age while waiting:
+    allowlisted authors first, then fresh posts, then originals before
+    reposts, and the oldest first within the same class.
+    """
+
+    def __init__(self):
+        self.posts: dict[str, HumanPost] = {}
+        # popped but not sent yet, polls must not queue them again meanwhile
+        self.in_flight: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.posts or key in self.in_flight
+
+    def done(self, posts: list[HumanPost]) -> None:
+        """Clears the in-flight mark, once sent or when the send failed."""
+        for post in posts:
+            self.in_flight.discard(PostCache.key(post))
+
+    @staticmethod
+    def post_time(post: HumanPost) -> datetime:
+        if post.is_repost and post.repost_info:
+            at = post.repost_info.at
+        else:
+            at = post.created_at
+        return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def is_allowed(post: HumanPost) -> bool:
+        allow = config.queue.allow_authors
+        if not allow:
+            return False
+        authors = [post.author]
+        if post.is_repost and post.repost_info:
+            authors.append(post.repost_info.by)
+        return any(a.handle in allow or a.did in allow for a in authors)
+
+    @staticmethod
+    def is_fresh(post: HumanPost, now: datetime) -> bool:
+        age = now - SendQueue.post_time(post)
+        return age <= timedelta(minutes=config.queue.fresh_minutes)
+
+    @staticmethod
+    def priority(post: HumanPost, now: datetime) -> tuple:
+        return (
+            not SendQueue.is_allowed(post),
+            not SendQueue.is_fresh(post, now),
+            post.is_repost,
+            SendQueue.post_time(post),
+        )
+
+    def put(self, post: HumanPost, now: Optional[datetime] = None) -> list[HumanPost]:
+        """Queues the post, returns the posts evicted to stay within maxsize."""
+        key = PostCache.key(post)
+        if key in self:
+            return []
+        self.posts[key] = post
+        evicted = []
+        if len(self.posts) > config.queue.maxsize:
+            now = now or datetime.now(timezone.utc)
+            key = max(self.posts, key=lambda k: self.priority(self.posts[k], now))
+            evicted.append(self.posts.pop(key))
+        return evicted
+
+    def pop_batch(self, size: int, now: Optional[datetime] = None) -> list[HumanPost]:
+        now = now or datetime.now(timezone.utc)
+        keys = sorted(self.posts, key=lambda k: self.priority(self.posts[k], now))
+        self.in_flight.update(keys[:size])
+        return [self.posts.pop(key) for key in keys[:size]]
+
+    def shed(
+        self, now: Optional[datetime] = None
+    ) -> tuple[list[HumanPost], list[HumanPost]]:
+        """
+        Applies the shedding policies. Returns (dropped, collapsed): dropped
+        posts are skipped silently, collapsed ones belong in a summary.
+        """
+        now = now or datetime.now(timezone.utc)
+        dropped = []
+        hours = config.queue.drop_repost_hours
+        if hours:
+            limit = now - timedelta(hours=hours)
+            for key, post in list(self.posts.items()):
+                if post.is_repost and self.post_time(post) < limit:
+                    dropped.append(self.posts.pop(key))
+        collapsed = []
+        over = len(self.posts) - config.queue.summary_over
+        if config.queue.summary_over and over > 0:
+            stale = [
+                key
+                for key, post in self.posts.items()
+                if not self.is_allowed(post) and not self.is_fresh(post, now)
+            ]
+            # the oldest part of the backlog is summarized
+            stale.sort(key=lambda k: self.post_time(self.posts[k]))
+            collapsed = [self.posts.pop(key) for key in stale[:over]]
+            self.in_flight.update(stale[:over])
+        return dropped, collapsed
+
+
+send_queue = SendQueue()
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import ujson
+from cashews import cache
+from pydantic import BaseModel
+
+from src.config import config
+from src.utils.log import logs
+from src.utils.path import DATA_PATH, atomic_write
+
+
+class SentMessage(BaseModel):
+    uri: str
+    message_id: int
+    # media messages are edited through their caption
+    caption: bool
+    # the sent text without the counters line
+    body: str
+    buttons: list[tuple[str, str]] = []
+    # like, quote, reply, repost
+    counts: tuple[int, int, int, int]
+    sent_at: float
+    checked_at: float
+
+    def interval(self, now: float) -> float:
+        """Seconds between refreshes, doubling as the message ages."""
+        age = now - self.sent_at
+        doubling = config.refresh.doubling_hours * 3600
+        return config.refresh.base_minutes * 60 * 2 ** min(age / doubling, 32)
+
+    def is_due(self, now: float) -> bool:
+        return now - self.checked_at >= self.interval(now)
+
+
+class SentMessages:
+    """
+    Messages whose counters are kept fresh, persisted as json. With the
+    cluster enabled, every flush merges them with the messages the other
+    replicas sent, so the leader refreshes all of them.
+    """
+
+    SHARED_KEY = "cluster:sent"
+    SHARED_LOCK = "cluster:sent:lock"
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data: "OrderedDict[str, SentMessage]" = OrderedDict()
+        # uri -> removal time, so merges do not bring removed messages back
+        self.removed: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="UTF-8") as f:
+                items = ujson.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logs.warning("[refresh] Broken sent messages file, ignored: %s", self.path)
+            return
+        self.data.clear()
+        for item in items:
+            message = SentMessage(**item)
+            self.data[message.uri] = message
+        self.prune(time.time())
+
+    async def flush(self) -> None:
+        if config.cluster.enable:
+            await self.sync()
+        data = ujson.dumps([m.model_dump() for m in self.data.values()])
+        # overlapping flushes each rename a complete file into place
+        await asyncio.to_thread(atomic_write, self.path, data)
+
+    def add(self, message: SentMessage) -> None:
+        self.data[message.uri] = message
+        self.data.move_to_end(message.uri)
+        while len(self.data) > config.refresh.maxsize:
+            self.data.popitem(last=False)
+
+    def remove(self, uri: str) -> None:
+        self.data.pop(uri, None)
+        if config.cluster.enable:
+            self.removed[uri] = time.time()
+
+    async def sync(self) -> None:
+        """Merges with the shared messages, the latest check of one wins."""
+        max_age = config.refresh.max_age_hours * 3600
+        async with cache.lock(self.SHARED_LOCK, expire=10, check_interval=0.05):
+            shared = await cache.get(self.SHARED_KEY) or {}
+            now = time.time()
+            self.removed = {
+                uri: at
+                for uri, at in {**shared.get("removed", {}), **self.removed}.items()
+                if now - at <= max_age
+            }
+            for item in shared.get("messages", []):
+                message = SentMessage(**item)
+                mine = self.data.get(message.uri)
+                if mine is None or message.checked_at > mine.checked_at:
+                    self.data[message.uri] = message
+            for uri in self.removed:
+                self.data.pop(uri, None)
+            self.prune(now)
+            messages = sorted(self.data.values(), key=lambda m: m.sent_at)
+            messages = messages[-config.refresh.maxsize :]
+            self.data = OrderedDict((m.uri, m) for m in messages)
+            await cache.set(
+                self.SHARED_KEY,
+                {
+                    "messages": [m.model_dump() for m in messages],
+                    "removed": self.removed,
+                },
+                expire=max_age,
+            )
+
+    def prune(self, now: float) -> None:
+        max_age = config.refresh.max_age_hours * 3600
+        for uri, message in list(self.data.items()):
+            if now - message.sent_at > max_age:
+                self.data.pop(uri)
+
+    def due(self, now: float) -> list[SentMessage]:
+        return [message for message in self.data.values() if message.is_due(now)]
+
+
+sent_messages = SentMessages(DATA_PATH / "sent_messages.json")
+sent_messages.load()
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from src.config import SourceConfig, config
+from src.core.bsky import BskyClient
+
+if TYPE_CHECKING:
+    from atproto_client.models.app.bsky.feed.defs import FeedViewPost
+
+# scheduler jitter, a source polled slightly early is still due
+POLL_SLACK = 30
+
+
+class Source:
+    """
+    One place posts are read from: the home timeline, a custom feed or a
+    list. Each source has its own poll interval and its own catch-up cursor.
+    """
+
+    def __init__(self, kind: str, uri: str = "", interval: int = 5):
+        self.kind = kind
+        self.uri = uri
+        self.interval = interval * 60
+        self.last_polled = 0.0
+        # newest item time of the previous poll
+        self.newest: Optional[datetime] = None
+        # cursor of an unfinished catch-up, and how far back it should go
+        self.cursor: Optional[str] = None
+        self.until: Optional[datetime] = None
+
+    @staticmethod
+    def from_config(source: SourceConfig) -> "Source":
+        return Source(source.kind, source.uri, source.interval)
+
+    @property
+    def name(self) -> str:
+        return self.kind if self.kind == "timeline" else f"{self.kind}:{self.uri}"
+
+    @property
+    def chronological(self) -> bool:
+        # custom feeds are ranked, paging back through them by time is meaningless
+        return self.kind != "feed"
+
+    def is_due(self, now: float) -> bool:
+        return now - self.last_polled + POLL_SLACK >= self.interval
+
+    @staticmethod
+    def item_time(item: "FeedViewPost") -> datetime:
+        at = item.post.indexed_at
+        if item.reason and getattr(item.reason, "indexed_at", None):
+            at = item.reason.indexed_at
+        return datetime.fromisoformat(at)
+
+    async def page(
+        self, client: BskyClient, cursor: Optional[str]
+    ) -> tuple[list["FeedViewPost"], Optional[str]]:
+        if self.kind == "timeline":
+            data = await client.client.get_timeline(cursor=cursor)
+        elif self.kind == "feed":
+            data = await client.client.app.bsky.feed.get_feed(
+                {"feed": self.uri, "cursor": cursor}
+            )
+        else:
+            data = await client.client.app.bsky.feed.get_list_feed(
+                {"list": self.uri, "cursor": cursor}
+            )
+        return data.feed, data.cursor
+
+    async def fetch(self, client: BskyClient) -> list["FeedViewPost"]:
+        self.last_polled = time.monotonic()
+        items, cursor = await self.page(client, None)
+        if not items:
+            return items
+        seen, self.newest = self.newest, max(map(self.item_time, items))
+        if not self.chronological:
+            return items
+        # the whole first page is new, older unseen posts may follow
+        if self.cursor is None and seen and min(map(self.item_time, items)) > seen:
+            self.cursor, self.until = cursor, seen
+        pages = 1
+        while self.cursor and pages < config.feeds.max_pages:
+            more, cursor = await self.page(client, self.cursor)
+            items.extend(more)
+            pages += 1
+            if more and cursor and min(map(self.item_time, more)) > self.until:
+                self.cursor = cursor
+            else:
+                self.cursor = None
+        return items
+
+
+def load_sources() -> list[Source]:
+    sources = [Source.from_config(source) for source in config.feeds.sources]
+    if config.feeds.timeline:
+        sources.insert(0, Source("timeline"))
+    return sources
+
+
+sources = load_sources()
@@ -1,16 +1,35 @@
 import asyncio
+import html
+import re
+import time
 import traceback
+from collections import deque
+from typing import Optional
 
 from pyrogram import Client
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
+from pyrogram.types import (
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+    InputMediaPhoto,
+    Message,
+)
 from pyrogram.enums import ParseMode
-from pyrogram.errors import FloodWait
+from pyrogram.errors import BadRequest, FloodWait
 
 from src.config import config
 from src.core.bsky import BskyClient
 from src.defs.cache import PostCache
-from src.defs.render import HumanPost
-from src.utils.log import logs
+from src.defs.cluster import cluster
+from src.defs.labels import label_policy
+from src.defs.media import media_processor
+from src.defs.message_index import message_index
+from src.defs.render import HumanPost, RENDER_VERSION
+from src.defs.send_queue import SendQueue, send_queue
+from src.defs.sent_messages import SentMessage, sent_messages
+from src.defs.sources import sources
+from src.utils.log import logs, post_logs
+from src.utils.lru import LRUCache
+from src.utils.rate_limit import SharedRateLimiter
 
 
 def flood_wait():
@@ -19,7 +38,7 @@ def flood_wait():
             try:
                 return await function(*args, **kwargs)
             except FloodWait as e:
-                logs.warning(f"遇到 FloodWait，等待 {e.value} 秒后重试！")
+                logs.warning("遇到 FloodWait，等待 %s 秒后重试！", e.value)
                 await asyncio.sleep(e.value + 1)
                 return await wrapper(*args, **kwargs)
             except Exception as e:
@@ -30,28 +49,54 @@ def flood_wait():
     return decorator
 
 
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+# rendered parent blocks and message bodies, without the counters line
+body_cache: LRUCache[str] = LRUCache(2048)
+# monotonic timestamps of recent telegram sends, used to detect bursts
+_send_times: deque[float] = deque(maxlen=256)
+# telegram api budget shared by sends and edits, and by replicas
+send_budget = SharedRateLimiter(
+    config.push.rate_per_minute, config.push.rate_burst, "cluster:budget"
+)
+# held while the send queue is drained, polls only enqueue meanwhile
+_drain_lock = asyncio.Lock()
+# background drain started by scheduled polls
+_drain_task: Optional[asyncio.Task] = None
+
+
 class Timeline:
     @staticmethod
-    async def get_timeline(client: BskyClient) -> list[HumanPost]:
-        posts = await client.client.get_timeline()
+    async def get_timeline(client: BskyClient, force: bool = False) -> list[HumanPost]:
+        """New posts of every due source, merged oldest first."""
+        now = time.monotonic()
+        due = [source for source in sources if force or source.is_due(now)]
+        results = await asyncio.gather(
+            *[source.fetch(client) for source in due], return_exceptions=True
+        )
         data = []
-        keys = []
-        for post in posts.feed:
-            try:
-                d = HumanPost.parse(post)
-                key = PostCache.key(d)
-                if await PostCache.get(d) or key in keys:
+        keys = set()
+        for source, result in zip(due, results):
+            if isinstance(result, BaseException):
+                logs.error("Error when fetching %s: %s", source.name, str(result))
+                continue
+            for post in result:
+                if label_policy.skips(post.post):
                     continue
-                data.append(d)
-                keys.append(key)
-            except Exception as e:
-                print(e)
-                logs.error(
-                    "Error when parsing post: %s",
-                    post.post.uri if post.post else str(e),
-                )
-        data.reverse()
-        keys.clear()
+                try:
+                    d = HumanPost.parse(post)
+                    key = PostCache.key(d)
+                    if key in keys or key in send_queue or await PostCache.get(d):
+                        continue
+                    data.append(d)
+                    keys.add(key)
+                except Exception as e:
+                    post_logs.error(
+                        "Error when parsing post: %s , %s",
+                        post.post.uri if post.post else "",
+                        str(e),
+                    )
+        data.sort(key=SendQueue.post_time)
         return data
 
     @staticmethod
@@ -74,37 +119,164 @@ class Timeline:
                     image,
                     caption=text if idx == 0 else None,
                     parse_mode=ParseMode.HTML,
+                    has_spoiler=post.need_spoiler,
                 )
             )
         return data
 
     @staticmethod
-    def get_post_text(post: HumanPost) -> str:
+    def get_content(post: HumanPost) -> str:
+        # a skipped parent can still be quoted, it is hidden as well
+        if post.label_action in ("hide", "skip"):
+            return f"<tg-spoiler>{post.content}</tg-spoiler>"
+        return post.content
+
+    @staticmethod
+    def get_parent_block(parent: HumanPost) -> str:
+        key = ("parent", parent.cid, RENDER_VERSION, parent.label_action)
+        text = body_cache.get(key)
+        if text is None:
+            text = f"> {Timeline.get_content(parent)}\n\n=====================\n\n"
+            body_cache.set(key, text)
+        return text
+
+    @staticmethod
+    def get_post_body(post: HumanPost, quote_parent: bool = True) -> str:
+        parent = post.parent_post
+        repost = post.repost_info
+        key = (
+            "body",
+            post.cid,
+            RENDER_VERSION,
+            quote_parent,
+            post.status,
+            post.author.format,
+            post.label_action,
+            (parent.cid, parent.status, parent.author.format, parent.label_action)
+            if parent
+            else None,
+            (repost.by.format, repost.at) if post.is_repost and repost else None,
+        )
+        text = body_cache.get(key)
+        if text is not None:
+            return text
         text = "<b>Bsky Timeline Update</b>\n\n"
-        if post.parent_post:
-            text += f"> {post.parent_post.content}\n\n=====================\n\n"
-        text += post.content
+        if parent and quote_parent:
+            text += Timeline.get_parent_block(parent)
+        text += Timeline.get_content(post)
         text += "\n\n"
-        if (post.is_reply or post.is_quote) and post.parent_post:
-            text += f"{post.parent_post.author.format} {post.parent_post.status}于 {post.parent_post.time_str}\n"
+        if (post.is_reply or post.is_quote) and parent:
+            text += f"{parent.author.format} {parent.status}于 {parent.time_str}\n"
         text += f"{post.author.format} {post.status}于 {post.time_str}\n"
+        if post.is_repost and repost:
+            text += f"{repost.by.format} 转发于 {repost.time_str}\n"
+        body_cache.set(key, text)
+        return text
+
+    @staticmethod
+    def format_stats(like: int, quote: int, reply: int, repost: int) -> str:
+        return f"点赞: {like} | 引用: {quote} | 回复: {reply} | 转发: {repost}"
+
+    @staticmethod
+    def get_post_stats(post: HumanPost) -> str:
+        # counters change between polls, so they are never cached
+        return Timeline.format_stats(
+            post.like_count, post.quote_count, post.reply_count, post.repost_count
+        )
+
+    @staticmethod
+    def get_post_text(post: HumanPost, quote_parent: bool = True) -> str:
+        body = Timeline.get_post_body(post, quote_parent)
+        return body + Timeline.get_post_stats(post)
+
+    @staticmethod
+    def get_parent_message_id(post: HumanPost) -> Optional[int]:
+        """The telegram message the parent post was delivered as, if any."""
+        if not post.parent_post or not (post.is_reply or post.is_quote):
+            return None
+        return message_index.get(post.parent_post.uri)
+
+    @staticmethod
+    def is_text_only(post: HumanPost) -> bool:
+        return not (post.images or post.gif or post.video)
+
+    @staticmethod
+    def get_digest_item(post: HumanPost) -> str:
+        text = f"{post.author.format} {post.status}于 {post.time_str}\n"
         if post.is_repost and post.repost_info:
             text += f"{post.repost_info.by.format} 转发于 {post.repost_info.time_str}\n"
-        text += f"点赞: {post.like_count} | 引用: {post.quote_count} | 回复: {post.reply_count} | 转发: {post.repost_count}"
+        text += Timeline.get_content(post)
+        text += f'\n<a href="{post.url}">Source</a>'
         return text
 
+    @staticmethod
+    def visible_length(text: str) -> int:
+        """Length of a html message as telegram limits it, in utf-16 units."""
+        visible = html.unescape(HTML_TAG_RE.sub("", text))
+        return len(visible.encode("utf-16-le")) // 2
+
+    @staticmethod
+    def take_digest(posts: list[HumanPost], start: int) -> tuple[list[HumanPost], str]:
+        """
+        Packs consecutive text-only posts from posts[start:] into one message
+        no longer than the telegram limit.
+        """
+        limit = config.digest.max_length
+        batch = []
+        text = "<b>Bsky Timeline Digest</b>"
+        length = Timeline.visible_length(text)
+        for post in posts[start:]:
+            if not Timeline.is_text_only(post):
+                break
+            item = "\n\n" + Timeline.get_digest_item(post)
+            item_length = Timeline.visible_length(item)
+            if length + item_length > limit:
+                break
+            batch.append(post)
+            text += item
+            length += item_length
+        return batch, text
+
+    @staticmethod
+    def sent_last_minute() -> int:
+        now = time.monotonic()
+        return sum(1 for t in _send_times if now - t < 60)
+
+    @staticmethod
+    def use_digest(pending: int) -> bool:
+        if not config.digest.enable:
+            return False
+        if pending >= config.digest.backlog:
+            return True
+        return Timeline.sent_last_minute() >= config.digest.rate
+
     @staticmethod
     @flood_wait()
-    async def send_to_user(bot: Client, post: HumanPost):
-        text = Timeline.get_post_text(post)
+    async def send_digest(bot: Client, text: str):
+        return await bot.send_message(
+            config.push.chat_id,
+            text,
+            disable_web_page_preview=True,
+            reply_to_message_id=config.push.topic_id,
+            parse_mode=ParseMode.HTML,
+        )
+
+    @staticmethod
+    @flood_wait()
+    async def send_to_user(bot: Client, post: HumanPost) -> Optional[Message]:
+        parent_message_id = Timeline.get_parent_message_id(post)
+        # thread under the delivered parent instead of quoting it again
+        text = Timeline.get_post_text(post, quote_parent=parent_message_id is None)
+        reply_to = parent_message_id or config.push.topic_id
         if post.gif:
             return await bot.send_animation(
                 config.push.chat_id,
                 post.gif,
                 caption=text,
-                reply_to_message_id=config.push.topic_id,
+                reply_to_message_id=reply_to,
                 parse_mode=ParseMode.HTML,
                 reply_markup=Timeline.get_button(post),
+                has_spoiler=post.need_spoiler,
             )
         elif post.video:
             return await bot.send_video(
@@ -112,16 +284,17 @@ class Timeline:
                 post.video,
                 caption=text,
                 thumb=post.video_thumbnail,
-                reply_to_message_id=config.push.topic_id,
+                reply_to_message_id=reply_to,
                 parse_mode=ParseMode.HTML,
                 reply_markup=Timeline.get_button(post),
+                has_spoiler=post.need_spoiler,
             )
         elif not post.images:
             return await bot.send_message(
                 config.push.chat_id,
                 text,
                 disable_web_page_preview=True,
-                reply_to_message_id=config.push.topic_id,
+                reply_to_message_id=reply_to,
                 parse_mode=ParseMode.HTML,
                 reply_markup=Timeline.get_button(post),
             )
@@ -130,26 +303,218 @@ class Timeline:
                 config.push.chat_id,
                 post.images[0],
                 caption=text,
-                reply_to_message_id=config.push.topic_id,
+                reply_to_message_id=reply_to,
                 parse_mode=ParseMode.HTML,
                 reply_markup=Timeline.get_button(post),
+                has_spoiler=post.need_spoiler,
             )
         else:
-            await bot.send_media_group(
+            messages = await bot.send_media_group(
                 config.push.chat_id,
                 Timeline.get_media_group(text, post),
-                reply_to_message_id=config.push.topic_id,
+                reply_to_message_id=reply_to,
             )
+            return messages[0] if messages else None
 
     @staticmethod
-    async def send_posts(client: BskyClient, bot: Client):
-        logs.info("Fetching posts to user...")
-        posts = await Timeline.get_timeline(client)
-        logs.info(f"Got {len(posts)} posts...Sending...")
+    async def prepare_media(post: HumanPost) -> HumanPost:
+        """A copy of the post with images and gif replaced by local files."""
+        update = {}
+        if post.images:
+            update["images"] = await media_processor.prepare_images(post.images)
+        if post.gif:
+            update["gif"] = (
+                await media_processor.prepare_animation(post.gif) or post.gif
+            )
+        return post.model_copy(update=update)
+
+    @staticmethod
+    async def send_post(bot: Client, post: HumanPost) -> Optional[Message]:
+        try:
+            return await Timeline.send_to_user(bot, post)
+        except BadRequest as e:
+            # telegram could not fetch or accept the media by url,
+            # upload a re-encoded copy instead
+            if not (post.images or post.gif):
+                raise e
+            post_logs.warning(
+                "Media rejected, retrying with local copy: %s , %s", post.url, str(e)
+            )
+            prepared = await Timeline.prepare_media(post)
+            return await Timeline.send_to_user(bot, prepared)
+
+    @staticmethod
+    def get_summary_texts(posts: list[HumanPost]) -> list[str]:
+        limit = config.digest.max_length
+        head = f"<b>Bsky Timeline Backlog</b>\n\n积压过多，以下 {len(posts)} 条动态仅列出链接："
+        texts, text = [], head
+        length = Timeline.visible_length(text)
         for post in posts:
+            line = f'\n{post.author.format} <a href="{post.url}">{post.status}于 {post.time_str}</a>'
+            line_length = Timeline.visible_length(line)
+            if length + line_length > limit:
+                texts.append(text)
+                text = "<b>Bsky Timeline Backlog</b>"
+                length = Timeline.visible_length(text)
+            text += line
+            length += line_length
+        texts.append(text)
+        return texts
+
+    @staticmethod
+    async def shed(bot: Client):
+        dropped, stale = send_queue.shed()
+        # replicas share the queue contents, only one of them summarizes a post
+        collapsed = await cluster.claim_many(stale)
+        for post in dropped:
+            await PostCache.set(post)
+        await cluster.forget(dropped)
+        if collapsed:
+            try:
+                for text in Timeline.get_summary_texts(collapsed):
+                    await send_budget.acquire()
+                    await Timeline.send_digest(bot, text)
+                    _send_times.append(time.monotonic())
+            except Exception as e:
+                logs.error("Error when sending backlog summary: %s", str(e))
+            for post in collapsed:
+                await PostCache.set(post)
+            await cluster.forget(collapsed)
+        send_queue.done(stale)
+        if dropped or collapsed:
+            logs.info(
+                "Backlog shed: %s dropped, %s summarized", len(dropped), len(collapsed)
+            )
+
+    @staticmethod
+    def track_message(post: HumanPost, message: Message, quote_parent: bool):
+        """Remembers a sent message, so its counters can be refreshed later."""
+        if not config.refresh.enable:
+            return
+        buttons = []
+        if not post.images or len(post.images) == 1:
+            buttons = [
+                (button.text, button.url)
+                for button in Timeline.get_button(post).inline_keyboard[0]
+            ]
+        now = time.time()
+        sent_messages.add(
+            SentMessage(
+                uri=post.uri,
+                message_id=message.id,
+                caption=not Timeline.is_text_only(post),
+                body=Timeline.get_post_body(post, quote_parent),
+                buttons=buttons,
+                counts=(
+                    post.like_count,
+                    post.quote_count,
+                    post.reply_count,
+                    post.repost_count,
+                ),
+                sent_at=now,
+                checked_at=now,
+            )
+        )
+
+    @staticmethod
+    async def send_batch(bot: Client, posts: list[HumanPost]):
+        # parents another replica delivered
+        await message_index.fetch(
+            [post.parent_post.uri for post in posts if post.parent_post]
+        )
+        idx = 0
+        while idx < len(posts):
+            post = posts[idx]
+            pending = len(posts) - idx + len(send_queue)
+            if Timeline.is_text_only(post) and Timeline.use_digest(pending):
+                batch, text = Timeline.take_digest(posts, idx)
+                if len(batch) > 1:
+                    idx += len(batch)
+                    try:
+                        await send_budget.acquire()
+                        message = await Timeline.send_digest(bot, text)
+                        _send_times.append(time.monotonic())
+                        for item in batch:
+                            await PostCache.set(item)
+                            label_policy.count(item.label_action)
+                            if message:
+                                message_index.set(item.uri, message.id)
+                    except Exception as e:
+                        post_logs.error(
+                            "Error when sending digest: %s , %s", batch[0].url, str(e)
+                        )
+                    continue
+            idx += 1
             try:
-                await Timeline.send_to_user(bot, post)
+                quote_parent = Timeline.get_parent_message_id(post) is None
+                await send_budget.acquire()
+                message = await Timeline.send_post(bot, post)
+                _send_times.append(time.monotonic())
                 await PostCache.set(post)
+                label_policy.count(post.label_action)
+                if message:
+                    message_index.set(post.uri, message.id)
+                    Timeline.track_message(post, message, quote_parent)
+                post_logs.debug("Sent post: %s", post.url)
             except Exception as e:
-                logs.error("Error when sending post: %s , %s", post.url, str(e))
+                post_logs.error("Error when sending post: %s , %s", post.url, str(e))
+
+    @staticmethod
+    async def fetch_posts(client: BskyClient, force: bool = False) -> int:
+        logs.info("Fetching posts to user...")
+        posts = await Timeline.get_timeline(client, force)
+        for post in posts:
+            for evicted in send_queue.put(post):
+                await PostCache.set(evicted)
+        if cluster.enabled:
+            await cluster.publish(posts)
+        logs.info("Got %s posts, %s waiting to send", len(posts), len(send_queue))
+        return len(posts)
+
+    @staticmethod
+    async def pull_pending() -> int:
+        """Queues posts another replica fetched, returns the queue size."""
+        if cluster.enabled:
+            for post in await cluster.pending(send_queue):
+                send_queue.put(post)
+        return len(send_queue)
+
+    @staticmethod
+    async def drain(bot: Client):
+        """Sends until the queue is empty, after any drain already running."""
+        async with _drain_lock:
+            while len(send_queue):
+                await Timeline.shed(bot)
+                posts = send_queue.pop_batch(config.queue.batch)
+                try:
+                    claimed = await cluster.claim_many(posts)
+                    await Timeline.send_batch(bot, claimed)
+                    await cluster.settle(claimed)
+                    # replies sent by other replicas thread to these
+                    await message_index.share()
+                finally:
+                    # sent posts are in PostCache now, failed ones may come again
+                    send_queue.done(posts)
+            await message_index.flush()
+            if config.refresh.enable:
+                await sent_messages.flush()
         logs.info("Sending posts to user done!")
+
+    @staticmethod
+    def start_drain(bot: Client) -> asyncio.Task:
+        """Drains in the background, so scheduled jobs do not wait on sending."""
+        global _drain_task
+        if _drain_task is None or _drain_task.done():
+            _drain_task = asyncio.create_task(Timeline.drain(bot))
+            _drain_task.add_done_callback(Timeline.log_drain_error)
+        return _drain_task
+
+    @staticmethod
+    def log_drain_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logs.error("Error when draining the send queue: %s", str(task.exception()))
+
+    @staticmethod
+    async def send_posts(client: BskyClient, bot: Client):
+        await Timeline.fetch_posts(client)
+        await Timeline.drain(bot)
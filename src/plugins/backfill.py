@@ -0,0 +1,69 @@
+import asyncio
+from typing import Optional
+
+from persica.factory.component import BaseComponent
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src.config import config
+from src.core.bot import TelegramBot
+from src.core.bsky import BskyClient
+from src.defs.backfill import Backfill
+from src.utils.log import logs
+
+_running: Optional[Backfill] = None
+_task: Optional[asyncio.Task] = None
+
+
+class BackfillBotPlugin(BaseComponent):
+    def __init__(self, telegram_bot: TelegramBot, client: BskyClient):
+        @telegram_bot.bot.on_message(
+            filters=filters.command("backfill_bsky") & filters.user(config.bot.owner)
+        )
+        async def backfill(_, message: "Message"):
+            global _running, _task
+            busy = _task is not None and not _task.done()
+            if len(message.command) < 2:
+                if busy:
+                    await message.reply(_running.progress)
+                else:
+                    await message.reply("用法：/backfill_bsky [handle 或 did | stop]")
+                return
+            if message.command[1] == "stop":
+                if busy:
+                    _task.cancel()
+                    await message.reply("已停止，再次执行将从断点继续！")
+                else:
+                    await message.reply("当前没有正在进行的回填！")
+                return
+            if busy:
+                await message.reply("已有回填正在进行，请稍后再试！")
+                return
+            try:
+                _running = await Backfill.open(
+                    client, telegram_bot.bot, message.command[1]
+                )
+            except Exception as e:
+                await message.reply(f"获取用户信息失败：{e}")
+                return
+            if _running.state.done:
+                await message.reply(_running.progress)
+                return
+            reply = await message.reply(f"开始回填 @{_running.state.handle} 的动态！")
+
+            async def on_progress(item: Backfill):
+                try:
+                    await reply.edit(item.progress)
+                except Exception:
+                    pass
+
+            async def run():
+                try:
+                    await _running.run(on_progress)
+                except asyncio.CancelledError:
+                    pass
+                except Exception as e:
+                    logs.error("[backfill] Backfill failed: %s", str(e))
+                    await reply.reply(f"回填中断，再次执行将从断点继续：{e}")
+
+            _task = asyncio.create_task(run())
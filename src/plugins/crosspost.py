@@ -0,0 +1,42 @@
+import asyncio
+from typing import Optional
+
+from persica.factory.component import AsyncInitializingComponent
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src.config import config
+from src.core.bot import TelegramBot
+from src.core.bsky import BskyClient
+from src.defs.crosspost import crossposter
+
+
+class CrosspostBotPlugin(AsyncInitializingComponent):
+    def __init__(self, telegram_bot: TelegramBot, client: BskyClient):
+        self.telegram_bot = telegram_bot
+        self.client = client
+        self.task: Optional[asyncio.Task] = None
+        if not config.crosspost.enable:
+            return
+
+        # commands sent in the chat still reach their own handlers, the
+        # separate group keeps this one from stopping them
+        @telegram_bot.bot.on_message(
+            filters=filters.chat(config.crosspost.chat_id)
+            & (filters.text | filters.photo)
+            & ~filters.service
+            & ~filters.regex(r"^/"),
+            group=1,
+        )
+        async def crosspost(_, message: "Message"):
+            await crossposter.put(message)
+
+    async def initialize(self):
+        if config.crosspost.enable:
+            self.task = asyncio.create_task(
+                crossposter.run(self.client, self.telegram_bot.bot)
+            )
+
+    async def shutdown(self):
+        if self.task:
+            self.task.cancel()
@@ -2,11 +2,26 @@ from persica.factory.component import BaseComponent
 from pyrogram import filters
 from pyrogram.types import Message
 
+from src.config import config
 from src.core.bot import TelegramBot
+from src.defs.labels import label_policy
+from src.utils.loop_monitor import loop_monitor
 
 
 class PingBotPlugin(BaseComponent):
     def __init__(self, telegram_bot: TelegramBot):
+        # registered first, so the owner gets the stats and everyone else a pong
+        @telegram_bot.bot.on_message(
+            filters=filters.command("ping_bsky") & filters.user(config.bot.owner)
+        )
+        async def ping_owner(_, message: "Message"):
+            lines = ["pong"]
+            if loop_monitor.running:
+                lines.append(loop_monitor.summary())
+            if label_policy.counters:
+                lines.append(f"labels: {label_policy.summary()}")
+            await message.reply("\n".join(lines))
+
         @telegram_bot.bot.on_message(filters=filters.command("ping_bsky"))
         async def ping(_, message: "Message"):
             await message.reply("pong")
@@ -0,0 +1,41 @@
+import html
+from io import BytesIO
+
+from persica.factory.component import BaseComponent
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src.config import config
+from src.core.bot import TelegramBot
+from src.utils.profiler import cycle_profiler
+
+MAX_CYCLES = 10
+
+
+class ProfileBotPlugin(BaseComponent):
+    def __init__(self, telegram_bot: TelegramBot):
+        @telegram_bot.bot.on_message(
+            filters=filters.command("profile_bsky") & filters.user(config.bot.owner)
+        )
+        async def profile(_, message: "Message"):
+            try:
+                cycles = int(message.command[1]) if len(message.command) > 1 else 1
+            except ValueError:
+                await message.reply("用法：/profile_bsky [次数]")
+                return
+            cycles = max(1, min(cycles, MAX_CYCLES))
+
+            async def on_done(report: str, folded: str):
+                await message.reply(
+                    f"<pre>{html.escape(report[:3900])}</pre>", quote=True
+                )
+                document = BytesIO(folded.encode("utf-8"))
+                document.name = "bsky_profile.folded"
+                await message.reply_document(
+                    document, caption="flamegraph.pl / speedscope", quote=True
+                )
+
+            if not cycle_profiler.arm(cycles, on_done):
+                await message.reply("已有性能分析正在进行，请稍后再试！")
+                return
+            await message.reply(f"将在接下来 {cycles} 次检查更新时进行性能分析！")
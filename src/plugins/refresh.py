@@ -0,0 +1,33 @@
+from asyncio import Lock
+
+from persica.factory.component import BaseComponent
+
+from src.config import config
+from src.core.bot import TelegramBot
+from src.core.bsky import BskyClient
+from src.core.scheduler import TimeScheduler
+from src.defs.cluster import cluster
+from src.defs.refresh import EngagementRefresher
+from src.utils.log import logs
+
+_lock = Lock()
+
+
+class RefreshBotPlugin(BaseComponent):
+    def __init__(
+        self, telegram_bot: TelegramBot, client: BskyClient, scheduler: TimeScheduler
+    ):
+        if not config.refresh.enable:
+            return
+
+        @scheduler.scheduler.scheduled_job(
+            "interval", minutes=config.refresh.base_minutes, id="refresh_counters"
+        )
+        async def refresh_counters():
+            # with the cluster enabled, only the leader edits messages
+            if _lock.locked() or (cluster.enabled and not cluster.is_leader):
+                return
+            async with _lock:
+                edited = await EngagementRefresher.refresh(client, telegram_bot.bot)
+                if edited:
+                    logs.info("[refresh] Refreshed counters of %s messages", edited)
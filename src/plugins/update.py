@@ -8,19 +8,44 @@ from src.config import config
 from src.core.bot import TelegramBot
 from src.core.bsky import BskyClient
 from src.core.scheduler import TimeScheduler
+from src.defs.cluster import cluster
 from src.defs.timeline import Timeline
+from src.utils.profiler import cycle_profiler
 
 _lock = Lock()
 
 
+async def poll(client: BskyClient, bot: Client, force: bool = False, wait: bool = True):
+    # only the leader replica fetches, every replica sends
+    if not cluster.enabled or await cluster.heartbeat():
+        # only the fetch is exclusive, sending runs from the shared queue
+        async with _lock:
+            await Timeline.fetch_posts(client, force)
+    await Timeline.pull_pending()
+    if wait:
+        await Timeline.drain(bot)
+    else:
+        # a long backlog must not keep the next scheduled poll from running
+        Timeline.start_drain(bot)
+
+
+async def run_poll(
+    client: BskyClient, bot: Client, force: bool = False, wait: bool = True
+):
+    if cycle_profiler.remaining:
+        # profiled cycles include their sends
+        await cycle_profiler.run(poll(client, bot, force))
+    else:
+        await poll(client, bot, force, wait)
+
+
 async def update_all(client: BskyClient, bot: Client, message: Message):
     if _lock.locked():
         await message.reply("正在检查更新，请稍后再试！")
         return
-    async with _lock:
-        msg = await message.reply("开始检查更新！")
-        await Timeline.send_posts(client, bot)
-        await msg.edit("检查更新完毕！")
+    msg = await message.reply("开始检查更新！")
+    await run_poll(client, bot, force=True)
+    await msg.edit("检查更新完毕！")
 
 
 class UpdateBotPlugin(BaseComponent):
@@ -40,5 +65,19 @@ class UpdateBotPlugin(BaseComponent):
         async def update_all_5_minutes():
             if _lock.locked():
                 return
-            async with _lock:
-                await Timeline.send_posts(client, telegram_bot.bot)
+            await run_poll(client, telegram_bot.bot, wait=False)
+
+        if cluster.enabled:
+
+            @scheduler.scheduler.scheduled_job(
+                "interval",
+                seconds=max(1, config.cluster.lease // 3),
+                id="cluster_heartbeat",
+            )
+            async def cluster_heartbeat():
+                # keeps the lease alive, takes over when the leader is gone,
+                # and picks up posts the leader fetched since the last poll;
+                # sending runs in the background so it never delays renewal
+                await cluster.heartbeat()
+                if await Timeline.pull_pending():
+                    Timeline.start_drain(telegram_bot.bot)
@@ -1,16 +1,89 @@
+import atexit
 import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
 
+import ujson
 from coloredlogs import ColoredFormatter
 
+from src.config import config
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return ujson.dumps(data, ensure_ascii=False)
+
+
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the queue never leaves the process, so message formatting and
+        # traceback rendering are left to the listener thread
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per `interval` seconds,
+    and reports how many were dropped once the window rolls over.
+    Warnings and errors are never sampled.
+    """
+
+    def __init__(self, burst: int, interval: float):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.window = 0.0
+        self.count = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        if now - self.window >= self.interval:
+            if self.dropped:
+                record.msg = f"({self.dropped} similar lines suppressed) {record.msg}"
+            self.window = now
+            self.count = 0
+            self.dropped = 0
+        self.count += 1
+        if self.count > self.burst:
+            self.dropped += 1
+            return False
+        return True
+
+
 logs = logging.getLogger("B2T")
+# per-post lines in the poll and send paths, sampled under load
+post_logs = logging.getLogger("B2T.post")
+post_logs.addFilter(SampleFilter(config.log.sample_burst, config.log.sample_interval))
 
 logging_format = "%(levelname)s [%(asctime)s] [%(name)s] %(message)s"
 logging_handler = logging.StreamHandler()
-logging_handler.setFormatter(ColoredFormatter(logging_format))
+if config.log.json_format:
+    logging_handler.setFormatter(JsonFormatter())
+else:
+    logging_handler.setFormatter(ColoredFormatter(logging_format))
+
+logging_queue = queue.SimpleQueue()
+logging_listener = QueueListener(
+    logging_queue, logging_handler, respect_handler_level=True
+)
+logging_listener.start()
+atexit.register(logging_listener.stop)
 
 logging.basicConfig(
     level=logging.INFO,
-    handlers=[logging_handler],
+    handlers=[LazyQueueHandler(logging_queue)],
 )
 
 root_logger = logging.getLogger()
@@ -19,4 +92,4 @@ root_logger.setLevel(logging.CRITICAL)
 pyro_logger = logging.getLogger("pyrogram")
 pyro_logger.setLevel(logging.CRITICAL)
 
-logs.setLevel(logging.INFO)
+logs.setLevel(config.log.level.upper())
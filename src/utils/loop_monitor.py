@@ -0,0 +1,113 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from src.config import config
+from src.utils.log import logs
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag with a heartbeat task. A watchdog thread
+    notices when the heartbeat stops and logs the stack of the loop thread,
+    which points at the callback blocking it.
+    """
+
+    def __init__(
+        self, interval: float = 1.0, threshold: float = 0.5, report_interval: float = 0
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        # lag of recent heartbeats, in seconds
+        self.lags: deque[float] = deque(maxlen=1024)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stack = ""
+        self.beat = 0.0
+        self.target: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    def start(self) -> None:
+        self.target = threading.get_ident()
+        self.beat = time.monotonic()
+        self.stop_event.clear()
+        self.task = asyncio.create_task(self.heartbeat())
+        self.thread = threading.Thread(
+            target=self.watchdog, name="B2T-monitor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    async def heartbeat(self) -> None:
+        reported = time.monotonic()
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.beat = now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                logs.warning("[monitor] Event loop stalled for %.3fs", lag)
+            if self.report_interval and now - reported >= self.report_interval:
+                reported = now
+                logs.info("[monitor] %s", self.summary())
+
+    def watchdog(self) -> None:
+        captured = 0.0
+        # checks often enough to catch a stall while it is still going on
+        while not self.stop_event.wait(self.threshold / 2):
+            beat = self.beat
+            late = time.monotonic() - beat - self.interval
+            if late < self.threshold or beat == captured:
+                continue
+            captured = beat
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            self.stalls += 1
+            self.last_stack = "".join(traceback.format_stack(frame))
+            logs.warning(
+                "[monitor] Event loop blocked for %.3fs, stack:\n%s",
+                late,
+                self.last_stack,
+            )
+
+    def percentile(self, p: float) -> float:
+        if not self.lags:
+            return 0.0
+        lags = sorted(self.lags)
+        return lags[min(len(lags) - 1, int(len(lags) * p / 100))]
+
+    def summary(self) -> str:
+        return (
+            f"loop lag p50 {self.percentile(50) * 1000:.1f}ms, "
+            f"p99 {self.percentile(99) * 1000:.1f}ms, "
+            f"max {self.max_lag * 1000:.1f}ms, stalls {self.stalls}"
+        )
+
+
+loop_monitor = LoopMonitor(
+    config.monitor.interval,
+    config.monitor.threshold,
+    config.monitor.report_minutes * 60,
+)
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """A small in-process LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.data: "OrderedDict[Hashable, V]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.data
+
+    def get(self, key: Hashable) -> Optional[V]:
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        return self.data.pop(key, None)
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,4 +1,23 @@
+import os
 from pathlib import Path
+from typing import Union
 
 DATA_PATH = Path("data")
 DATA_PATH.mkdir(exist_ok=True)
+
+
+def atomic_write(path: Union[Path, str], data: Union[bytes, str]) -> None:
+    """
+    Writes through a temporary file renamed into place, so readers and
+    concurrent writers never see a partial file.
+    """
+    tmp = f"{path}.{os.getpid()}.{id(data)}.tmp"
+    mode = "wb" if isinstance(data, bytes) else "w"
+    encoding = None if isinstance(data, bytes) else "UTF-8"
+    try:
+        with open(tmp, mode, encoding=encoding) as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
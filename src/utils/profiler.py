@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread from a background thread and
+    aggregates the samples as folded stacks (flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.labels: dict = {}
+        self.target: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            name = os.path.basename(code.co_filename)
+            label = f"{code.co_qualname} ({name}:{code.co_firstlineno})"
+            self.labels[code] = label
+        return label
+
+    def start(self) -> None:
+        self.target = threading.get_ident()
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="B2T-profiler", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append(self.label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+    def top(self, limit: int = 15) -> tuple[list, list]:
+        """(self samples, total samples) per function, most first."""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return own.most_common(limit), total.most_common(limit)
+
+
+class CycleProfiler:
+    """
+    Profiles the next N poll cycles once armed. While not armed the
+    poll path only checks `remaining`, so there is no overhead; allocations
+    are traced only while an armed cycle runs.
+    """
+
+    def __init__(self):
+        self.remaining = 0
+        self.running = False
+        self.cycles = 0
+        self.elapsed = 0.0
+        self.peak = 0
+        # "file:line" -> (bytes, blocks) still allocated when a cycle ended
+        self.allocations: dict[str, tuple[int, int]] = {}
+        self.sampler: Optional[SamplingProfiler] = None
+        self.on_done: Optional[Callable[[str, str], Awaitable]] = None
+
+    def arm(self, cycles: int, on_done: Callable[[str, str], Awaitable]) -> bool:
+        if self.remaining:
+            return False
+        self.remaining = cycles
+        self.cycles = 0
+        self.elapsed = 0.0
+        self.peak = 0
+        self.allocations = {}
+        self.sampler = SamplingProfiler()
+        self.on_done = on_done
+        return True
+
+    async def run(self, coro: Awaitable):
+        if self.running:
+            # overlapping cycles are not sampled twice
+            return await coro
+        self.running = True
+        tracemalloc.start(10)
+        started = time.perf_counter()
+        self.sampler.start()
+        try:
+            return await coro
+        finally:
+            # joining the sampler thread must not block the event loop
+            await asyncio.to_thread(self.sampler.stop)
+            self.collect()
+            self.running = False
+            self.elapsed += time.perf_counter() - started
+            self.cycles += 1
+            self.remaining -= 1
+            if not self.remaining:
+                await self.finish()
+
+    def collect(self) -> None:
+        """Adds up the allocations of the cycle that ended and stops tracing."""
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.peak = max(self.peak, peak)
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            site = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            size, count = self.allocations.get(site, (0, 0))
+            self.allocations[site] = (size + stat.size, count + stat.count)
+
+    def report(self) -> str:
+        own, total = self.sampler.top()
+        samples = self.sampler.samples or 1
+        lines = [
+            f"Profiled {self.cycles} cycles in {self.elapsed:.2f}s, "
+            f"{self.sampler.samples} samples, peak traced memory {self.peak / 2**20:.1f} MiB",
+            "",
+            "Top functions (self):",
+        ]
+        lines += [f"{c * 100 / samples:5.1f}% {name}" for name, c in own]
+        lines += ["", "Top functions (total):"]
+        lines += [f"{c * 100 / samples:5.1f}% {name}" for name, c in total]
+        lines += ["", "Top allocation sites:"]
+        sites = sorted(self.allocations.items(), key=lambda i: i[1][0], reverse=True)
+        for site, (size, count) in sites[:15]:
+            lines.append(f"{size / 1024:8.1f} KiB {count:6d} {site}")
+        return "\n".join(lines)
+
+    async def finish(self) -> None:
+        report = self.report()
+        folded = self.sampler.folded()
+        on_done, self.on_done, self.sampler = self.on_done, None, None
+        if on_done:
+            await on_done(report, folded)
+
+
+cycle_profiler = CycleProfiler()
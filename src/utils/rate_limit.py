@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from cashews import cache
+
+from src.config import config
+
+
+class RateLimiter:
+    """
+    Token bucket shared by everything that calls the telegram api.
+    `per_minute` of 0 disables the limit.
+    """
+
+    def __init__(self, per_minute: float, burst: int):
+        self.configure(per_minute, burst)
+
+    def configure(self, per_minute: float, burst: int) -> None:
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        if not self.rate:
+            return
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def try_acquire(self, reserve: int = 0) -> bool:
+        """Takes a token only if `reserve` more stay available for others."""
+        if not self.rate:
+            return True
+        self.refill()
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket that, with the cluster enabled, also holds every replica
+    sharing the cache backend to the same rate, counted in fixed windows
+    of `burst` calls.
+    """
+
+    def __init__(self, per_minute: float, burst: int, key: str):
+        super().__init__(per_minute, burst)
+        self.key = key
+
+    async def acquire(self) -> None:
+        await super().acquire()
+        if not self.rate or not config.cluster.enable:
+            return
+        window = self.burst / self.rate
+        while True:
+            now = time.time()
+            slot = int(now // window)
+            count = await cache.incr(f"{self.key}:{slot}", expire=window * 2)
+            if count <= self.burst:
+                return
+            await asyncio.sleep((slot + 1) * window - now)
@@ -0,0 +1,12 @@
+import pytest
+
+from src.defs.timeline import send_budget
+
+
+@pytest.fixture
+def unlimited_budget():
+    """Lifts the telegram rate limit for one test, restoring it afterwards."""
+    saved = vars(send_budget).copy()
+    send_budget.configure(0, send_budget.burst)
+    yield send_budget
+    vars(send_budget).update(saved)
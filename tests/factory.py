@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.defs.render import HumanAuthor, HumanPost, HumanRepostInfo
+
+NOW = datetime(2024, 10, 20, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def make_author(handle: str = "alice.bsky.social") -> HumanAuthor:
+    return HumanAuthor(
+        display_name=handle.split(".")[0],
+        handle=handle,
+        did=f"did:plc:{handle.split('.')[0]}",
+        created_at=NOW,
+    )
+
+
+def make_post(
+    cid: str = "cid1",
+    content: str = "hello",
+    author: Optional[HumanAuthor] = None,
+    created_at: datetime = NOW,
+    parent_post: Optional[HumanPost] = None,
+    repost_by: Optional[HumanAuthor] = None,
+    **kwargs,
+) -> HumanPost:
+    author = author or make_author()
+    data = dict(
+        cid=cid,
+        content=content,
+        images=[],
+        created_at=created_at,
+        like_count=0,
+        quote_count=0,
+        reply_count=0,
+        repost_count=0,
+        uri=f"at://{author.did}/app.bsky.feed.post/{cid}",
+        author=author,
+        labels=[],
+        parent_post=parent_post,
+        is_reply=parent_post is not None,
+    )
+    if repost_by:
+        data["is_repost"] = True
+        data["repost_info"] = HumanRepostInfo(by=repost_by, at=created_at)
+    data.update(kwargs)
+    return HumanPost(**data)
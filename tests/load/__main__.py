@@ -0,0 +1,144 @@
+"""
+Offline load test of the fetch -> queue -> send pipeline.
+
+    python -m tests.load --posts 10000 --cycles 288
+
+Serves a simulated day of generated posts from a local fake XRPC server,
+runs one poll per cycle through Timeline against a fake Telegram sink,
+and reports throughput, delivery latency percentiles and memory.
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from atproto import AsyncClient
+from cashews import cache
+
+from src.defs.message_index import message_index
+from src.defs.timeline import Timeline, send_budget
+from src.utils.log import logs
+from tests.load.data import FeedGenerator, utcnow
+from tests.load.telegram import FakeTelegram
+from tests.load.xrpc import FakeXrpcServer
+
+
+class LoadBskyClient:
+    """Same shape as BskyClient, pointed at the fake server without login."""
+
+    def __init__(self, base_url: str):
+        self.client = AsyncClient(base_url)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(
+    posts: int = 10000,
+    cycles: int = 288,
+    interval: int = 300,
+    latency: float = 0.002,
+    flood_rate: float = 0.0,
+    seed: int = 0,
+    rate_per_minute: float = 0,
+) -> dict:
+    cache.setup("mem://")
+    # unlimited by default, to measure the pipeline rather than the budget
+    send_budget.configure(rate_per_minute, 20)
+    message_index.path = Path(tempfile.mkdtemp()) / "message_index.json"
+    generator = FeedGenerator(seed=seed)
+    server = FakeXrpcServer(generator)
+    await server.start()
+    bsky = LoadBskyClient(server.base_url)
+    bot = FakeTelegram(latency=latency, flood_rate=flood_rate, seed=seed)
+
+    # rkey -> (age in seconds when it became visible, monotonic time it did)
+    visible: dict[str, tuple[float, float]] = {}
+    per_cycle, extra = divmod(posts, cycles)
+    tracemalloc.start()
+    started = time.monotonic()
+    for cycle in range(cycles):
+        count = per_cycle + (1 if cycle < extra else 0)
+        window = utcnow() - timedelta(seconds=interval)
+        items = generator.generate(window, interval, count)
+        now = time.monotonic()
+        for item in items:
+            if "reason" in item:
+                continue
+            rkey = item["post"]["uri"].rsplit("/", 1)[-1]
+            at = item["post"]["indexedAt"]
+            age = (
+                utcnow() - datetime.fromisoformat(at.replace("Z", "+00:00"))
+            ).total_seconds()
+            visible[rkey] = (age, now)
+        server.publish(items)
+        await Timeline.fetch_posts(bsky, force=True)
+        await Timeline.drain(bot)
+    elapsed = time.monotonic() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await server.stop()
+
+    latencies = [
+        age + (bot.delivered[rkey] - at)
+        for rkey, (age, at) in visible.items()
+        if rkey in bot.delivered
+    ]
+    return {
+        "posts": posts,
+        "new_posts": len(visible),
+        "delivered": len(latencies),
+        "telegram_calls": bot.calls,
+        "flood_waits": bot.floods,
+        "xrpc_requests": server.requests,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_posts_s": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "latency_p50_s": round(percentile(latencies, 50), 1),
+        "latency_p95_s": round(percentile(latencies, 95), 1),
+        "latency_p99_s": round(percentile(latencies, 99), 1),
+        "traced_mem_mb": round(current / 2**20, 1),
+        "traced_peak_mb": round(peak / 2**20, 1),
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=288)
+    parser.add_argument("--interval", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--flood-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-per-minute", type=float, default=0)
+    args = parser.parse_args()
+    logs.setLevel(logging.WARNING)
+    report = asyncio.run(
+        run(
+            args.posts,
+            args.cycles,
+            args.interval,
+            args.latency,
+            args.flood_rate,
+            args.seed,
+            args.rate_per_minute,
+        )
+    )
+    for key, value in report.items():
+        print(f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+def iso(at: datetime) -> str:
+    return at.isoformat().replace("+00:00", "Z")
+
+
+class FeedGenerator:
+    """
+    Generates app.bsky.feed.defs#feedViewPost items shaped like the real
+    getTimeline output: plain posts, images, replies, quotes and reposts.
+    """
+
+    def __init__(self, authors: int = 200, seed: int = 0):
+        self.random = random.Random(seed)
+        self.authors = [self.make_author(i) for i in range(authors)]
+        self.posts: dict[str, dict] = {}
+        self.count = 0
+
+    @staticmethod
+    def make_author(idx: int) -> dict:
+        return {
+            "did": f"did:plc:loadtest{idx:06d}",
+            "handle": f"user{idx}.bsky.social",
+            "displayName": f"User {idx}",
+            "createdAt": "2023-01-01T00:00:00.000Z",
+        }
+
+    def resolve_handle(self, handle: str) -> Optional[str]:
+        for author in self.authors:
+            if author["handle"] == handle:
+                return author["did"]
+        return None
+
+    def make_view(self, at: datetime, embed: Optional[dict] = None) -> dict:
+        self.count += 1
+        author = self.random.choice(self.authors)
+        rkey = f"3load{self.count:010d}"
+        text = " ".join(
+            self.random.choice(["bsky", "telegram", "post", "hello", "load", "test"])
+            for _ in range(self.random.randint(3, 60))
+        )
+        view = {
+            "$type": "app.bsky.feed.defs#postView",
+            "uri": f"at://{author['did']}/app.bsky.feed.post/{rkey}",
+            "cid": f"bafyreiload{self.count:040d}",
+            "author": author,
+            "record": {
+                "$type": "app.bsky.feed.post",
+                "text": text,
+                "createdAt": iso(at),
+            },
+            "indexedAt": iso(at),
+            "likeCount": self.random.randint(0, 100),
+            "replyCount": self.random.randint(0, 10),
+            "repostCount": self.random.randint(0, 10),
+            "quoteCount": 0,
+            "labels": [],
+        }
+        if embed:
+            view["embed"] = embed
+        self.posts[view["uri"]] = view
+        return view
+
+    def make_images(self) -> dict:
+        # the post rkey is part of the url, so deliveries can be traced back
+        rkey = f"3load{self.count + 1:010d}"
+        return {
+            "$type": "app.bsky.embed.images#view",
+            "images": [
+                {
+                    "thumb": f"https://cdn.example.invalid/post/{rkey}/thumb{i}.jpg",
+                    "fullsize": f"https://cdn.example.invalid/post/{rkey}/{i}.jpg",
+                    "alt": "",
+                }
+                for i in range(self.random.randint(1, 4))
+            ],
+        }
+
+    def make_quote(self, quoted: dict) -> dict:
+        return {
+            "$type": "app.bsky.embed.record#view",
+            "record": {
+                "$type": "app.bsky.embed.record#viewRecord",
+                "uri": quoted["uri"],
+                "cid": quoted["cid"],
+                "author": quoted["author"],
+                "value": quoted["record"],
+                "indexedAt": quoted["indexedAt"],
+                "likeCount": quoted["likeCount"],
+                "replyCount": quoted["replyCount"],
+                "repostCount": quoted["repostCount"],
+                "quoteCount": quoted["quoteCount"],
+            },
+        }
+
+    def make_item(self, at: datetime) -> dict:
+        roll = self.random.random()
+        earlier = list(self.posts.values())[-500:]
+        if roll < 0.15 and earlier:
+            parent = self.random.choice(earlier)
+            view = self.make_view(at)
+            ref = {"uri": parent["uri"], "cid": parent["cid"]}
+            view["record"]["reply"] = {"root": ref, "parent": ref}
+            return {"post": view, "reply": {"root": parent, "parent": parent}}
+        if roll < 0.3 and earlier:
+            return {
+                "post": self.random.choice(earlier),
+                "reason": {
+                    "$type": "app.bsky.feed.defs#reasonRepost",
+                    "by": self.random.choice(self.authors),
+                    "indexedAt": iso(at),
+                },
+            }
+        if roll < 0.4 and earlier:
+            return {
+                "post": self.make_view(at, self.make_quote(self.random.choice(earlier)))
+            }
+        if roll < 0.6:
+            return {"post": self.make_view(at, self.make_images())}
+        return {"post": self.make_view(at)}
+
+    def generate(self, start: datetime, seconds: float, count: int) -> list[dict]:
+        """`count` items spread over `seconds` after `start`, oldest first."""
+        offsets = sorted(self.random.uniform(0, seconds) for _ in range(count))
+        return [self.make_item(start + timedelta(seconds=o)) for o in offsets]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
@@ -0,0 +1,85 @@
+import asyncio
+import io
+import random
+import re
+import time
+from typing import Optional
+
+from pyrogram.errors import FloodWait
+
+POST_RE = re.compile(r"/post/([\w]+)")
+
+
+class FakeMessage:
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+
+class FakeTelegram:
+    """
+    Stands in for the pyrogram client: accepts the send calls Timeline
+    makes, adds latency, raises FloodWait at the given rate and records
+    which posts each message delivered.
+    """
+
+    def __init__(self, latency: float = 0.002, flood_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.random = random.Random(seed)
+        self.message_id = 0
+        self.calls = 0
+        self.floods = 0
+        # post rkey -> monotonic delivery time
+        self.delivered: dict[str, float] = {}
+        # concurrent media downloads, now and at most
+        self.downloading = 0
+        self.max_downloading = 0
+
+    async def call(
+        self, text: Optional[str], reply_markup=None, media: str = ""
+    ) -> FakeMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.flood_rate and self.random.random() < self.flood_rate:
+            self.floods += 1
+            raise FloodWait(value=0)
+        now = time.monotonic()
+        links = POST_RE.findall(text or "") + POST_RE.findall(media)
+        if reply_markup:
+            for row in reply_markup.inline_keyboard:
+                links.extend(POST_RE.findall(row[0].url or ""))
+        for rkey in links:
+            self.delivered.setdefault(rkey, now)
+        self.message_id += 1
+        return FakeMessage(self.message_id)
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        return await self.call(text, reply_markup)
+
+    async def send_photo(
+        self, chat_id, photo, caption=None, reply_markup=None, **kwargs
+    ):
+        return await self.call(caption, reply_markup)
+
+    async def send_animation(
+        self, chat_id, animation, caption=None, reply_markup=None, **kwargs
+    ):
+        return await self.call(caption, reply_markup)
+
+    async def send_video(
+        self, chat_id, video, caption=None, reply_markup=None, **kwargs
+    ):
+        return await self.call(caption, reply_markup)
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        message = await self.call(media[0].caption, media=media[0].media)
+        return [message] + [FakeMessage(message.id) for _ in media[1:]]
+
+    async def download_media(self, message, in_memory=False, **kwargs):
+        self.downloading += 1
+        self.max_downloading = max(self.max_downloading, self.downloading)
+        try:
+            await asyncio.sleep(self.latency)
+            return io.BytesIO(b"\xff" * message.photo.file_size)
+        finally:
+            self.downloading -= 1
@@ -0,0 +1,171 @@
+import asyncio
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import ujson
+
+from tests.load.data import FeedGenerator
+
+
+class FakeXrpcServer:
+    """
+    Minimal HTTP/1.1 server answering the XRPC calls the bot makes:
+    getTimeline, getFeed, getListFeed, getAuthorFeed, getProfile,
+    getPostThread and resolveHandle from generated data, uploadBlob and
+    createRecord into memory.
+    """
+
+    def __init__(self, generator: FeedGenerator, host: str = "127.0.0.1"):
+        self.generator = generator
+        self.host = host
+        self.port = 0
+        self.feed: list[dict] = []
+        self.requests = 0
+        self.server: Optional[asyncio.Server] = None
+        self.writers: set[asyncio.StreamWriter] = set()
+        # sizes of uploaded blobs and created records, in order
+        self.blobs: list[int] = []
+        self.records: list[dict] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/xrpc"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+
+    def publish(self, items: list[dict]):
+        """Makes items visible on the timeline, items are oldest first."""
+        self.feed.extend(items)
+
+    @staticmethod
+    def paginate(feed: list[dict], query: dict) -> tuple[int, dict]:
+        limit = int(query.get("limit", ["50"])[0])
+        end = len(feed) - int(query.get("cursor", ["0"])[0])
+        start = max(0, end - limit)
+        data = {"feed": list(reversed(feed[start:end]))}
+        if start > 0:
+            data["cursor"] = str(len(feed) - start)
+        return 200, data
+
+    def get_timeline(self, query: dict) -> tuple[int, dict]:
+        return self.paginate(self.feed, query)
+
+    def get_feed(self, query: dict) -> tuple[int, dict]:
+        # custom feeds and lists serve every other timeline item
+        return self.paginate(self.feed[::2], query)
+
+    def author_feed(self, actor: str) -> list[dict]:
+        # own posts and replies, reposts are left out as with the real filter
+        return [
+            item
+            for item in self.feed
+            if "reason" not in item and item["post"]["author"]["did"] == actor
+        ]
+
+    def get_author_feed(self, query: dict) -> tuple[int, dict]:
+        return self.paginate(self.author_feed(query.get("actor", [""])[0]), query)
+
+    def get_profile(self, query: dict) -> tuple[int, dict]:
+        actor = query.get("actor", [""])[0]
+        actor = self.generator.resolve_handle(actor) or actor
+        for author in self.generator.authors:
+            if author["did"] == actor:
+                return 200, {**author, "postsCount": len(self.author_feed(actor))}
+        return 400, {"error": "InvalidRequest", "message": "Profile not found"}
+
+    def get_post_thread(self, query: dict) -> tuple[int, dict]:
+        post = self.generator.posts.get(query.get("uri", [""])[0])
+        if post is None:
+            return 400, {"error": "NotFound", "message": "Post not found"}
+        thread = {"$type": "app.bsky.feed.defs#threadViewPost", "post": post}
+        return 200, {"thread": thread}
+
+    def resolve_handle(self, query: dict) -> tuple[int, dict]:
+        did = self.generator.resolve_handle(query.get("handle", [""])[0])
+        if did is None:
+            return 400, {"error": "InvalidRequest", "message": "Unable to resolve"}
+        return 200, {"did": did}
+
+    def upload_blob(self, body: bytes) -> tuple[int, dict]:
+        self.blobs.append(len(body))
+        blob = {
+            "$type": "blob",
+            "ref": {"$link": f"bafkreiblob{len(self.blobs):040d}"},
+            "mimeType": "image/jpeg",
+            "size": len(body),
+        }
+        return 200, {"blob": blob}
+
+    def create_record(self, body: bytes) -> tuple[int, dict]:
+        data = ujson.loads(body)
+        self.records.append(data["record"])
+        rkey = f"3rec{len(self.records):010d}"
+        return 200, {
+            "uri": f"at://{data['repo']}/{data['collection']}/{rkey}",
+            "cid": f"bafyreirecord{len(self.records):040d}",
+        }
+
+    def route(self, target: str, body: bytes = b"") -> tuple[int, dict]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        method = url.path.rsplit("/", 1)[-1]
+        if method == "app.bsky.feed.getTimeline":
+            return self.get_timeline(query)
+        if method in ("app.bsky.feed.getFeed", "app.bsky.feed.getListFeed"):
+            return self.get_feed(query)
+        if method == "app.bsky.feed.getAuthorFeed":
+            return self.get_author_feed(query)
+        if method == "app.bsky.actor.getProfile":
+            return self.get_profile(query)
+        if method == "app.bsky.feed.getPostThread":
+            return self.get_post_thread(query)
+        if method == "com.atproto.identity.resolveHandle":
+            return self.resolve_handle(query)
+        if method == "com.atproto.repo.uploadBlob":
+            return self.upload_blob(body)
+        if method == "com.atproto.repo.createRecord":
+            return self.create_record(body)
+        return 501, {"error": "MethodNotImplemented", "message": method}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                _, target, _ = line.decode("latin-1").split(" ", 2)
+                length, body = 0, b""
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                if length:
+                    body = await reader.readexactly(length)
+                self.requests += 1
+                status, data = self.route(target, body)
+                body = ujson.dumps(data).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import timedelta
+
+from cashews import cache
+
+from src.defs import backfill
+from src.defs.backfill import Backfill
+from src.defs.message_index import message_index
+from tests.load.__main__ import LoadBskyClient
+from tests.load.data import FeedGenerator, utcnow
+from tests.load.telegram import FakeTelegram
+from tests.load.xrpc import FakeXrpcServer
+
+DID = "did:plc:loadtest000000"
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_backfill_resumes_from_checkpoint(monkeypatch, tmp_path, unlimited_budget):
+    cache.setup("mem://")
+    monkeypatch.setattr(backfill, "BACKFILL_PATH", tmp_path)
+    monkeypatch.setattr(message_index, "path", tmp_path / "message_index.json")
+
+    async def interrupt(_):
+        raise Interrupted
+
+    async def main():
+        generator = FeedGenerator(authors=2, seed=3)
+        server = FakeXrpcServer(generator)
+        await server.start()
+        server.publish(generator.generate(utcnow() - timedelta(days=1), 86400, 600))
+        client = LoadBskyClient(server.base_url)
+        bot = FakeTelegram(latency=0)
+        try:
+            first = await Backfill.open(client, bot, "user0.bsky.social")
+            try:
+                await first.run(interrupt)
+            except Interrupted:
+                pass
+            calls = bot.calls
+            second = await Backfill.open(client, bot, DID)
+            resumed = second.state.model_copy()
+            await second.run()
+            return first, resumed, second, calls, bot, len(server.author_feed(DID))
+        finally:
+            await server.stop()
+
+    first, resumed, second, calls, bot, total = asyncio.run(main())
+    assert total > backfill.PAGE_LIMIT
+    assert first.state.total == total
+    # the first page was checkpointed before the interruption
+    assert calls == backfill.PAGE_LIMIT
+    assert resumed.sent == backfill.PAGE_LIMIT and resumed.cursor
+    assert second.state.done
+    assert second.state.sent == total and not second.state.skipped
+    assert bot.calls == total
+    assert second.eta == 0
+    assert (tmp_path / "did_plc_loadtest000000.json").exists()
+
+
+def test_backfill_resumes_within_page(monkeypatch, tmp_path, unlimited_budget):
+    cache.setup("mem://")
+    monkeypatch.setattr(backfill, "BACKFILL_PATH", tmp_path)
+    monkeypatch.setattr(message_index, "path", tmp_path / "message_index.json")
+    stop_at = backfill.PAGE_LIMIT + 30
+
+    async def main():
+        generator = FeedGenerator(authors=2, seed=3)
+        server = FakeXrpcServer(generator)
+        await server.start()
+        server.publish(generator.generate(utcnow() - timedelta(days=1), 86400, 600))
+        client = LoadBskyClient(server.base_url)
+        bot = FakeTelegram(latency=0)
+        try:
+            first = await Backfill.open(client, bot, DID)
+            send = first.send
+
+            async def send_until_crash(post):
+                if bot.calls == stop_at:
+                    raise Interrupted
+                await send(post)
+
+            first.send = send_until_crash
+            try:
+                await first.run()
+            except Interrupted:
+                pass
+            # a restart loses the in-memory sent marks
+            await cache.clear()
+            index = (tmp_path / "message_index.json").read_text()
+            # as the cli runs it, next to a bot owning the index file
+            second = await Backfill.open(client, bot, DID, persist_index=False)
+            resumed = second.state.model_copy()
+            await second.run()
+            assert (tmp_path / "message_index.json").read_text() == index
+            return resumed, second, bot, len(server.author_feed(DID))
+        finally:
+            await server.stop()
+
+    resumed, second, bot, total = asyncio.run(main())
+    assert resumed.sent == stop_at and resumed.last_uri
+    assert second.state.done and second.state.last_uri is None
+    assert second.state.sent == total
+    # nothing sent before the crash went out again
+    assert bot.calls == total
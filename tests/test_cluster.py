@@ -0,0 +1,204 @@
+import asyncio
+import time
+
+import pytest
+from cashews import cache
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeAsyncRedisConnection
+
+from src.config import config
+from src.defs.cache import PostCache
+from src.defs.cluster import Cluster
+from src.defs.message_index import MessageIndex
+from src.defs.sent_messages import SentMessage, SentMessages
+from src.utils.rate_limit import SharedRateLimiter
+
+from tests.factory import make_post
+
+
+@pytest.fixture(autouse=True, params=["mem", "redis"])
+def cluster_config(request, monkeypatch):
+    # the memory backend and fakeredis stand in for a shared redis
+    if request.param == "redis":
+        cache.setup(
+            "redis://localhost",
+            connection_class=FakeAsyncRedisConnection,
+            server=FakeServer(),
+            health_check_interval=0,
+            suppress=False,
+        )
+    else:
+        cache.setup("mem://")
+    monkeypatch.setattr(config.cluster, "enable", True)
+    monkeypatch.setattr(config.cluster, "lease", 1)
+
+
+def test_single_leader_and_failover():
+    first, second = Cluster("first"), Cluster("second")
+
+    async def main():
+        assert await first.heartbeat()
+        assert not await second.heartbeat()
+        # renewing keeps the lease
+        assert await first.heartbeat()
+        assert not await second.heartbeat()
+        # the leader dies, its lease runs out
+        await asyncio.sleep(1.2)
+        assert await second.heartbeat()
+        assert not await first.heartbeat()
+        await second.resign()
+        assert await first.heartbeat()
+
+    asyncio.run(main())
+
+
+def test_posts_claimed_once(monkeypatch):
+    first, second = Cluster("first"), Cluster("second")
+    posts = [make_post(cid=f"c{i}") for i in range(4)]
+
+    async def no_scan(*args, **kwargs):
+        raise AssertionError("pending posts must not scan the keyspace")
+        yield
+
+    monkeypatch.setattr(cache, "get_match", no_scan)
+    monkeypatch.setattr(cache, "scan", no_scan)
+
+    async def main():
+        await first.publish(posts)
+        pending = await second.pending()
+        assert sorted(p.cid for p in pending) == ["c0", "c1", "c2", "c3"]
+        mine = await first.claim_many(posts[:3])
+        theirs = await second.claim_many(pending)
+        assert {p.cid for p in mine} | {p.cid for p in theirs} == {
+            "c0",
+            "c1",
+            "c2",
+            "c3",
+        }
+        assert not {p.cid for p in mine} & {p.cid for p in theirs}
+        # a failed send gives the post back
+        await first.release(posts[0])
+        assert await second.claim(posts[0])
+        # sent posts are no longer pending
+        await PostCache.set(posts[1])
+        await first.settle(posts[:2])
+        assert [p.cid for p in await first.pending()] == ["c0", "c2", "c3"]
+        # posts a replica already queued are not fetched again
+        assert [p.cid for p in await first.pending({"post:c0"})] == ["c2", "c3"]
+
+    asyncio.run(main())
+
+
+def test_sent_post_not_claimed_after_claim_ttl(monkeypatch):
+    monkeypatch.setattr(config.cluster, "claim_ttl", 1)
+    first, second = Cluster("first"), Cluster("second")
+    post = make_post(cid="sent")
+
+    async def main():
+        assert await first.claim_many([post]) == [post]
+        await PostCache.set(post)
+        # the claim is gone, the sent mark still keeps the post out
+        await asyncio.sleep(1.2)
+        assert await second.claim_many([post]) == []
+
+    asyncio.run(main())
+
+
+def test_renew_only_own_lease():
+    first, second = Cluster("first"), Cluster("second")
+
+    async def main():
+        assert await first.heartbeat()
+        assert not await second.renew(1)
+        assert await first.renew(1)
+        await first.resign()
+        assert not await first.renew(1)
+
+    asyncio.run(main())
+
+
+def test_failing_post_given_up(monkeypatch):
+    monkeypatch.setattr(config.cluster, "max_attempts", 3)
+    replicas = [Cluster("first"), Cluster("second")]
+    post = make_post(cid="broken")
+
+    async def main():
+        await replicas[0].publish([post])
+        tries = 0
+        for i in range(10):
+            replica = replicas[i % 2]
+            claimed = await replica.claim_many(await replica.pending())
+            if not claimed:
+                break
+            # every send of it fails
+            tries += 1
+            await replica.settle(claimed)
+        return tries, await replicas[0].pending(), await PostCache.get(post)
+
+    tries, pending, marked = asyncio.run(main())
+    assert tries == 3
+    assert not pending and marked
+
+
+def test_message_index_shared(tmp_path):
+    first = MessageIndex(tmp_path / "first.json")
+    second = MessageIndex(tmp_path / "second.json")
+
+    async def main():
+        first.set("at://parent", 42)
+        await first.share()
+        await second.fetch(["at://parent", "at://unknown"])
+
+    asyncio.run(main())
+    assert second.get("at://parent") == 42
+    assert second.get("at://unknown") is None
+    assert not second.unshared
+
+
+def make_message(uri: str, sent_at: float) -> SentMessage:
+    return SentMessage(
+        uri=uri,
+        message_id=1,
+        caption=False,
+        body="",
+        counts=(0, 0, 0, 0),
+        sent_at=sent_at,
+        checked_at=sent_at,
+    )
+
+
+def test_sent_messages_merged(tmp_path):
+    first = SentMessages(tmp_path / "first.json")
+    second = SentMessages(tmp_path / "second.json")
+    now = time.time()
+
+    async def main():
+        first.add(make_message("a", sent_at=now))
+        second.add(make_message("b", sent_at=now + 1))
+        await first.flush()
+        await second.flush()
+        await first.flush()
+        assert list(first.data) == list(second.data) == ["a", "b"]
+        # the leader refreshed one and dropped the other
+        first.data["b"].checked_at = now + 60
+        first.remove("a")
+        await first.flush()
+        await second.flush()
+
+    asyncio.run(main())
+    assert list(second.data) == ["b"]
+    assert second.data["b"].checked_at == now + 60
+
+
+def test_budget_shared_by_replicas():
+    first = SharedRateLimiter(0.01, 2, "test:budget")
+    second = SharedRateLimiter(0.01, 2, "test:budget")
+
+    async def main():
+        await first.acquire()
+        await second.acquire()
+        # each bucket has a token left, the shared window does not
+        await asyncio.wait_for(first.acquire(), 0.3)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+from atproto import models
+from cashews import cache
+
+from src.defs.bsky_richtext import HTML
+from src.defs.crosspost import MAX_LENGTH, Crossposter
+from tests.load.__main__ import LoadBskyClient
+from tests.load.data import FeedGenerator
+from tests.load.telegram import FakeTelegram
+from tests.load.xrpc import FakeXrpcServer
+
+
+class Text(str):
+    @property
+    def html(self) -> str:
+        return str(self)
+
+
+def make_message(message_id: int, text=None, photo=0, media_group_id=None):
+    return SimpleNamespace(
+        id=message_id,
+        text=Text(text) if text and not photo else None,
+        caption=Text(text) if text and photo else None,
+        photo=SimpleNamespace(file_size=photo) if photo else None,
+        media_group_id=media_group_id,
+    )
+
+
+def test_crosspost_messages_and_albums():
+    cache.setup("mem://")
+
+    async def main():
+        server = FakeXrpcServer(FeedGenerator(authors=3))
+        await server.start()
+        client = LoadBskyClient(server.base_url)
+        client.client.me = models.AppBskyActorDefs.ProfileViewDetailed(
+            did="did:plc:crosspost", handle="bot.bsky.social"
+        )
+        bot = FakeTelegram(latency=0.01)
+        crossposter = Crossposter(HTML(server.base_url), maxsize=2, album_wait=0.05)
+        worker = asyncio.create_task(crossposter.run(client, bot))
+        try:
+            await crossposter.put(
+                make_message(
+                    1,
+                    '<a href="https://bsky.app/profile/user1.bsky.social">@user1</a>'
+                    ' 😀 <a href="https://example.com">link</a>'
+                    ' <a href="https://bsky.app/profile/user1.bsky.social/post/3l6">'
+                    "post</a>",
+                )
+            )
+            for i in range(5):
+                await crossposter.put(
+                    make_message(2 + i, "album" if i == 0 else None, 2000, "g")
+                )
+            await crossposter.put(make_message(7))
+            await crossposter.put(make_message(8, "x" * 1000))
+            await asyncio.sleep(0.1)
+            await crossposter.queue.join()
+            # created posts are marked, so the timeline does not forward them
+            cached = [
+                await cache.get(f"post:bafyreirecord{i:040d}") for i in range(1, 4)
+            ]
+            return server, bot, crossposter, cached
+        finally:
+            worker.cancel()
+            await server.stop()
+
+    server, bot, crossposter, cached = asyncio.run(main())
+    assert crossposter.posted == 3 and not crossposter.failed
+    records = {record["text"][:5]: record for record in server.records}
+    assert len(records) == 3
+
+    mention = records["@user"]
+    data = mention["text"].encode("utf-8")
+    facets = {
+        data[f["index"]["byteStart"] : f["index"]["byteEnd"]].decode(): f["features"][0]
+        for f in mention["facets"]
+    }
+    assert facets["@user1"]["did"] == "did:plc:loadtest000001"
+    assert facets["link"]["uri"] == "https://example.com"
+    # post links stay links, only profile urls become mentions
+    assert facets["post"]["uri"].endswith("/post/3l6")
+
+    album = records["album"]
+    assert len(album["embed"]["images"]) == 4
+    assert server.blobs == [2000] * 4
+    assert bot.max_downloading == 4
+
+    assert len(records["xxxxx"]["text"]) == MAX_LENGTH
+    assert all(cached)
@@ -0,0 +1,44 @@
+from src.config import config
+from src.defs.timeline import Timeline
+
+from tests.factory import make_post
+
+
+def test_digest_stops_at_media_post():
+    posts = [
+        make_post(cid="a", content="one"),
+        make_post(cid="b", content="two"),
+        make_post(cid="c", content="three", images=["https://example.com/1.jpg"]),
+        make_post(cid="d", content="four"),
+    ]
+    batch, text = Timeline.take_digest(posts, 0)
+    assert [post.cid for post in batch] == ["a", "b"]
+    assert posts[0].url in text and posts[1].url in text
+
+
+def test_digest_respects_length_limit():
+    posts = [make_post(cid=str(i), content="x" * 1000) for i in range(10)]
+    batch, text = Timeline.take_digest(posts, 0)
+    assert 1 < len(batch) < len(posts)
+    assert len(text) <= config.digest.max_length
+    rest, _ = Timeline.take_digest(posts, len(batch))
+    assert rest[0].cid == str(len(batch))
+
+
+def test_digest_counts_utf16_units():
+    assert Timeline.visible_length('<b>a</b>&amp;<a href="x">😀</a>') == 4
+    posts = [make_post(cid=str(i), content="😀" * 300) for i in range(20)]
+    batch, text = Timeline.take_digest(posts, 0)
+    # each emoji is two units, raw html length would pack 8 of them
+    assert 1 < len(batch) < 8
+    assert Timeline.visible_length(text) <= config.digest.max_length
+    texts = Timeline.get_summary_texts(posts)
+    assert all(Timeline.visible_length(t) <= config.digest.max_length for t in texts)
+
+
+def test_digest_only_when_enabled(monkeypatch):
+    monkeypatch.setattr(config.digest, "enable", False)
+    assert not Timeline.use_digest(1000)
+    monkeypatch.setattr(config.digest, "enable", True)
+    assert Timeline.use_digest(config.digest.backlog)
+    assert not Timeline.use_digest(1)
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+from cashews import cache
+
+from src.config import LabelsConfig
+from src.defs import timeline
+from src.defs.labels import LabelPolicy
+from src.defs.sources import Source
+from src.defs.timeline import Timeline
+from tests.factory import make_post
+from tests.load.__main__ import LoadBskyClient
+from tests.load.data import FeedGenerator, iso, utcnow
+from tests.load.xrpc import FakeXrpcServer
+
+MOD = "did:plc:moderation"
+EXTRA = "did:plc:extra"
+AUTHOR = "did:plc:author"
+
+
+def make_policy() -> LabelPolicy:
+    return LabelPolicy(
+        LabelsConfig(
+            labelers=[MOD],
+            actions={"porn": "spoiler", "gore": "hide"},
+            labeler_actions={EXTRA: {"spam": "skip"}},
+        )
+    )
+
+
+def label(src: str, val: str, neg: bool = False):
+    return SimpleNamespace(src=src, val=val, neg=neg)
+
+
+def test_decide():
+    policy = make_policy()
+    assert policy.decide(None, AUTHOR) is None
+    assert policy.decide([label(MOD, "porn")], AUTHOR) == "spoiler"
+    # self labels use the default actions
+    assert policy.decide([label(AUTHOR, "gore")], AUTHOR) == "hide"
+    # untrusted labelers and negated labels do not count
+    assert policy.decide([label("did:plc:other", "porn")], AUTHOR) is None
+    assert policy.decide([label(MOD, "porn", neg=True)], AUTHOR) is None
+    # per-labeler actions, the strongest action wins
+    assert policy.decide([label(MOD, "spam")], AUTHOR) is None
+    labels = [label(MOD, "porn"), label(EXTRA, "spam"), label(EXTRA, "gore")]
+    assert policy.decide(labels, AUTHOR) == "skip"
+    assert policy.trusted_values(labels + [label("did:plc:x", "a")], AUTHOR) == [
+        "porn",
+        "spam",
+        "gore",
+    ]
+
+
+def test_hidden_content_is_spoilered():
+    post = make_post(content="secret", images=["a.jpg"], label_action="hide")
+    assert post.need_spoiler
+    assert "<tg-spoiler>secret</tg-spoiler>" in Timeline.get_post_body(post)
+    assert not make_post(cid="cid2").need_spoiler
+
+
+def test_skipped_posts_are_not_parsed(monkeypatch):
+    cache.setup("mem://")
+    policy = make_policy()
+    monkeypatch.setattr(timeline, "label_policy", policy)
+    monkeypatch.setattr(timeline, "sources", [Source("timeline")])
+    parsed = []
+    parse = timeline.HumanPost.parse
+    monkeypatch.setattr(
+        timeline.HumanPost, "parse", lambda data: parsed.append(data) or parse(data)
+    )
+
+    async def main():
+        generator = FeedGenerator(seed=2)
+        server = FakeXrpcServer(generator)
+        await server.start()
+        items = generator.generate(utcnow() - timedelta(hours=1), 3600, 40)
+        skipped = set()
+        for item in items[::4]:
+            if "reason" in item:
+                continue
+            post = item["post"]
+            post["labels"] = [
+                {"src": EXTRA, "uri": post["uri"], "val": "spam", "cts": iso(utcnow())}
+            ]
+            skipped.add(post["uri"])
+        server.publish(items)
+        try:
+            posts = await Timeline.get_timeline(LoadBskyClient(server.base_url))
+        finally:
+            await server.stop()
+        return posts, skipped
+
+    posts, skipped = asyncio.run(main())
+    assert skipped and posts
+    assert not {post.uri for post in posts} & skipped
+    assert not {item.post.uri for item in parsed} & skipped
+    assert policy.counters["skip"] == len(skipped)
+
+
+def test_skipped_post_counted_once():
+    policy = make_policy()
+    post = SimpleNamespace(
+        uri="at://post",
+        author=SimpleNamespace(did=AUTHOR),
+        labels=[label(EXTRA, "spam")],
+    )
+    for _ in range(3):
+        assert policy.skips(post)
+    assert policy.counters["skip"] == 1
@@ -0,0 +1,10 @@
+import asyncio
+
+from tests.load.__main__ import run
+
+
+def test_pipeline_delivers_every_new_post():
+    report = asyncio.run(run(posts=120, cycles=4, latency=0))
+    assert report["new_posts"] > 0
+    assert report["delivered"] == report["new_posts"]
+    assert report["xrpc_requests"] == 4
@@ -0,0 +1,41 @@
+import logging
+
+import ujson
+
+from src.utils.log import JsonFormatter, SampleFilter
+
+
+def make_record(msg: str, *args, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("B2T.post", level, __file__, 1, msg, args, None)
+
+
+def test_sample_filter_drops_after_burst():
+    sample = SampleFilter(burst=2, interval=3600)
+    results = [sample.filter(make_record("line %s", i)) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert sample.dropped == 3
+
+
+def test_sample_filter_keeps_errors():
+    sample = SampleFilter(burst=1, interval=3600)
+    sample.filter(make_record("a"))
+    assert not sample.filter(make_record("b"))
+    assert sample.filter(make_record("send failed", level=logging.ERROR))
+    assert sample.filter(make_record("retry", level=logging.WARNING))
+    assert sample.dropped == 1
+
+
+def test_sample_filter_reports_dropped():
+    sample = SampleFilter(burst=1, interval=3600)
+    sample.filter(make_record("a"))
+    sample.filter(make_record("b"))
+    sample.interval = 0
+    record = make_record("c")
+    assert sample.filter(record)
+    assert "1 similar lines suppressed" in record.msg
+
+
+def test_json_formatter():
+    data = ujson.loads(JsonFormatter().format(make_record("sent %s", "x")))
+    assert data["message"] == "sent x"
+    assert data["level"] == "INFO"
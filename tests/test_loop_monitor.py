@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from src.utils.loop_monitor import LoopMonitor
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+def test_stall_is_measured_with_its_stack():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+
+    async def main():
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            blocking_call()
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+
+    asyncio.run(main())
+    assert not monitor.running
+    assert monitor.stalls == 1
+    assert "blocking_call" in monitor.last_stack
+    assert monitor.max_lag >= 0.25
+    assert monitor.percentile(50) < 0.1
+    assert "stalls 1" in monitor.summary()
@@ -0,0 +1,97 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from src.config import config
+from src.defs.media import MediaProcessor, blob_cid, convert_photo
+
+
+def image_bytes(size: tuple[int, int], fmt: str, mode: str = "RGB") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 100, 50)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = MediaProcessor(tmp_path)
+    yield processor
+    processor.shutdown()
+
+
+def test_blob_cid():
+    cid = "bafkreihdwdcefgh4dqkjv67uzcmw7ojee6xedzdetojuzjevtenxquvyku"
+    url = f"https://cdn.bsky.app/img/feed_fullsize/plain/did:plc:abc/{cid}@jpeg"
+    assert blob_cid(url) == cid
+    assert blob_cid("https://media.tenor.com/x.gif") == blob_cid(
+        "https://media.tenor.com/x.gif"
+    )
+
+
+def test_small_jpeg_kept_as_is(tmp_path):
+    data = image_bytes((100, 80), "JPEG")
+    out = convert_photo(data, str(tmp_path / "a"), 1024 * 1024, 2560)
+    assert out == str(tmp_path / "a.jpg")
+    assert open(out, "rb").read() == data
+
+
+def test_small_png_keeps_its_extension(tmp_path):
+    data = image_bytes((100, 80), "PNG")
+    out = convert_photo(data, str(tmp_path / "p"), 1024 * 1024, 2560)
+    assert out == str(tmp_path / "p.png")
+    assert open(out, "rb").read() == data
+    assert [f.name for f in tmp_path.iterdir()] == ["p.png"]
+
+
+def test_oversize_and_unsupported_reencoded(tmp_path):
+    out = convert_photo(
+        image_bytes((12000, 300), "BMP"), str(tmp_path / "b"), 1024 * 1024, 2560
+    )
+    with Image.open(out) as img:
+        assert img.format == "JPEG"
+        assert max(img.size) <= 2560
+        assert max(img.size) <= 20 * min(img.size)
+
+
+def test_transparent_gif_flattened(tmp_path):
+    out = convert_photo(
+        image_bytes((64, 64), "GIF", "P"), str(tmp_path / "c"), 1024, 2560
+    )
+    with Image.open(out) as img:
+        assert img.format == "JPEG"
+        assert img.mode == "RGB"
+
+
+def test_process_in_pool_is_cached(processor, tmp_path):
+    data = image_bytes((8000, 3000), "PNG")
+
+    async def run():
+        first = await processor.process_photo(data, "cid1")
+        second = await processor.process_photo(b"", "cid1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == str(tmp_path / "cid1.jpg")
+    with Image.open(first) as img:
+        assert max(img.size) <= 2560
+
+
+def test_cache_pruned_least_recently_used(processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(config.media, "cache_mb", 1)
+    for i in range(3):
+        (tmp_path / f"old{i}.jpg").write_bytes(b"x" * 400 * 1024)
+        os.utime(tmp_path / f"old{i}.jpg", (i, i))
+    # a cache hit makes the oldest file the most recently used one
+    assert processor.cached_photo("old0") == str(tmp_path / "old0.jpg")
+
+    async def run():
+        await processor.process_photo(image_bytes((100, 100), "JPEG"), "new")
+
+    asyncio.run(run())
+    # old1 is the least recently used now
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ["new.jpg", "old0.jpg", "old2.jpg"]
+    assert processor.size <= 1024 * 1024
@@ -0,0 +1,55 @@
+import asyncio
+
+from src.defs.message_index import MessageIndex, message_index
+from src.defs.timeline import Timeline
+
+from tests.factory import make_post
+
+
+def test_index_bounded_and_expiring(tmp_path):
+    index = MessageIndex(tmp_path / "index.json", maxsize=2, ttl=60)
+    index.set("a", 1)
+    index.set("b", 2)
+    index.set("c", 3)
+    assert index.get("a") is None
+    assert index.get("c") == 3
+    index.ttl = -1
+    index.set("d", 4)
+    assert index.get("d") is None
+
+
+def test_index_persisted(tmp_path):
+    index = MessageIndex(tmp_path / "index.json")
+    index.set("at://x/app.bsky.feed.post/1", 42)
+    asyncio.run(index.flush())
+    loaded = MessageIndex(tmp_path / "index.json")
+    loaded.load()
+    assert loaded.get("at://x/app.bsky.feed.post/1") == 42
+
+
+def test_concurrent_flushes_leave_whole_file(tmp_path):
+    index = MessageIndex(tmp_path / "index.json")
+
+    async def main():
+        for i in range(500):
+            index.set(f"at://x/app.bsky.feed.post/{i}", i)
+        await asyncio.gather(*(index.flush() for _ in range(8)))
+
+    asyncio.run(main())
+    loaded = MessageIndex(tmp_path / "index.json")
+    loaded.load()
+    assert len(loaded.data) == 500
+    assert [p.name for p in tmp_path.iterdir()] == ["index.json"]
+
+
+def test_reply_threads_to_delivered_parent():
+    parent = make_post(cid="p1", content="parent text")
+    reply = make_post(cid="r1", content="reply text", parent_post=parent)
+    assert Timeline.get_parent_message_id(reply) is None
+    assert "> parent text" in Timeline.get_post_text(reply)
+    message_index.set(parent.uri, 100)
+    try:
+        assert Timeline.get_parent_message_id(reply) == 100
+        assert "> parent text" not in Timeline.get_post_text(reply, False)
+    finally:
+        message_index.data.pop(parent.uri)
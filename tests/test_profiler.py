@@ -0,0 +1,43 @@
+import asyncio
+import time
+import tracemalloc
+
+from src.utils.profiler import CycleProfiler
+
+
+def busy_render():
+    data = []
+    end = time.perf_counter() + 0.1
+    while time.perf_counter() < end:
+        data.append(str(len(data)) * 10)
+    return data
+
+
+async def cycle():
+    busy_render()
+
+
+def test_profiles_armed_cycles_only():
+    profiler = CycleProfiler()
+    results = []
+
+    async def on_done(report: str, folded: str):
+        results.append((report, folded))
+
+    async def main():
+        assert profiler.arm(2, on_done)
+        assert not profiler.arm(1, on_done)
+        await profiler.run(cycle())
+        assert not results
+        # nothing is traced between armed cycles
+        assert not tracemalloc.is_tracing()
+        await profiler.run(cycle())
+
+    asyncio.run(main())
+    assert profiler.remaining == 0
+    report, folded = results[0]
+    assert "Profiled 2 cycles" in report
+    assert "busy_render" in report
+    assert "Top allocation sites" in report
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.config import config
+from src.defs.refresh import EngagementRefresher
+from src.defs.sent_messages import SentMessage, sent_messages
+from src.utils.rate_limit import RateLimiter
+
+
+def make_message(uri: str, counts=(10, 0, 0, 0), sent_at=0.0) -> SentMessage:
+    return SentMessage(
+        uri=uri,
+        message_id=1,
+        caption=False,
+        body="body\n\n",
+        buttons=[("Source", "https://bsky.app/profile/a/post/1")],
+        counts=counts,
+        sent_at=sent_at,
+        checked_at=sent_at,
+    )
+
+
+class FakeBsky:
+    def __init__(self, counts: dict):
+        self.counts = counts
+        self.calls = []
+        self.client = self
+
+    async def get_posts(self, uris):
+        self.calls.append(uris)
+        return SimpleNamespace(
+            posts=[
+                SimpleNamespace(
+                    uri=uri,
+                    like_count=self.counts[uri],
+                    quote_count=0,
+                    reply_count=0,
+                    repost_count=0,
+                )
+                for uri in uris
+                if uri in self.counts
+            ]
+        )
+
+
+class FakeBot:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        self.edits.append(text)
+
+
+def test_noticeable_change():
+    assert not EngagementRefresher.is_noticeable((100, 0, 0, 0), (105, 0, 0, 0))
+    assert EngagementRefresher.is_noticeable((100, 0, 0, 0), (111, 0, 0, 0))
+    assert not EngagementRefresher.is_noticeable((0, 0, 0, 0), (0, 1, 0, 0))
+    assert EngagementRefresher.is_noticeable((0, 0, 0, 0), (0, 0, 2, 0))
+
+
+def test_refresh_interval_decays():
+    message = make_message("a")
+    hour = 3600
+    assert not message.is_due(60)
+    assert message.is_due(config.refresh.base_minutes * 60 * 2)
+    later = config.refresh.doubling_hours * hour
+    message.checked_at = later - config.refresh.base_minutes * 60
+    # the interval doubled, the last check is too recent
+    assert not message.is_due(later)
+    old = make_message("b", sent_at=0)
+    old.checked_at = 8 * hour
+    # eight hours old: the interval doubled twice
+    assert old.interval(8 * hour) == config.refresh.base_minutes * 60 * 4
+
+
+def test_refresh_edits_changed_posts(monkeypatch, tmp_path, unlimited_budget):
+    monkeypatch.setattr(sent_messages, "path", tmp_path / "sent.json")
+    monkeypatch.setattr(sent_messages, "data", type(sent_messages.data)())
+    uris = [f"at://did:plc:a/app.bsky.feed.post/{i}" for i in range(30)]
+    for uri in uris:
+        sent_messages.add(make_message(uri, sent_at=time.time() - 3600))
+    counts = {uri: 10 for uri in uris}
+    counts[uris[0]] = 50
+    counts.pop(uris[1])
+    bsky, bot = FakeBsky(counts), FakeBot()
+    edited = asyncio.run(EngagementRefresher.refresh(bsky, bot))
+    assert edited == 1
+    assert "点赞: 50" in bot.edits[0]
+    assert [len(call) for call in bsky.calls] == [25, 5]
+    assert uris[1] not in sent_messages.data
+    assert sent_messages.data[uris[0]].counts[0] == 50
+    assert (tmp_path / "sent.json").exists()
+
+
+def test_rate_limiter_reserve():
+    limiter = RateLimiter(per_minute=60, burst=3)
+    assert limiter.try_acquire(reserve=1)
+    assert limiter.try_acquire(reserve=1)
+    assert not limiter.try_acquire(reserve=1)
+    assert limiter.try_acquire()
@@ -0,0 +1,65 @@
+from src.defs.render import HumanPost, content_cache
+from src.defs.timeline import Timeline, body_cache
+from src.utils.lru import LRUCache
+
+from tests.factory import make_author, make_post
+
+
+class FakeRecord:
+    def __init__(self, text: str):
+        self.text = text
+        self.facets = None
+
+
+def test_lru_evicts_oldest():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.hits == 3
+    assert cache.get("b") is None
+    assert cache.misses == 1
+
+
+def test_render_content_reused_by_cid():
+    content_cache.clear()
+    assert HumanPost.render_content("cid-x", FakeRecord("first")) == "first"
+    # same cid means same record, the cached render is returned
+    assert HumanPost.render_content("cid-x", FakeRecord("other")) == "first"
+    assert content_cache.hits == 1
+
+
+def test_post_text_counters_not_cached():
+    body_cache.clear()
+    post = make_post(content="body")
+    text = Timeline.get_post_text(post)
+    assert "点赞: 0" in text
+    post.like_count = 5
+    text = Timeline.get_post_text(post)
+    assert "点赞: 5" in text
+    assert body_cache.hits == 1
+
+
+def test_parent_block_shared():
+    body_cache.clear()
+    parent = make_post(cid="parent", content="parent text")
+    first = make_post(cid="r1", content="reply 1", parent_post=parent)
+    second = make_post(cid="r2", content="reply 2", parent_post=parent)
+    assert "> parent text" in Timeline.get_post_text(first)
+    assert "> parent text" in Timeline.get_post_text(second)
+    assert body_cache.hits == 1
+
+
+def test_repost_body_keyed_by_reposter():
+    body_cache.clear()
+    post = make_post(cid="orig")
+    bob = make_post(cid="orig", repost_by=make_author("bob.bsky.social"))
+    carol = make_post(cid="orig", repost_by=make_author("carol.bsky.social"))
+    assert "bob" not in Timeline.get_post_text(post)
+    assert "bob" in Timeline.get_post_text(bob)
+    assert "carol" in Timeline.get_post_text(carol)
+    assert body_cache.hits == 0
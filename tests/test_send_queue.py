@@ -0,0 +1,151 @@
+import asyncio
+from datetime import timedelta
+
+from cashews import cache
+
+from src.config import config
+from src.defs import timeline
+from src.defs.cache import PostCache
+from src.defs.message_index import message_index
+from src.defs.send_queue import SendQueue, send_queue
+from src.defs.sources import Source
+from src.defs.timeline import Timeline
+from src.plugins.update import poll
+
+from tests.factory import NOW, make_author, make_post
+from tests.load.__main__ import LoadBskyClient
+from tests.load.data import FeedGenerator, utcnow
+from tests.load.telegram import FakeTelegram
+from tests.load.xrpc import FakeXrpcServer
+
+
+def test_fresh_and_allowed_first(monkeypatch):
+    monkeypatch.setattr(config.queue, "allow_authors", ["vip.bsky.social"])
+    queue = SendQueue()
+    old = make_post(cid="old", created_at=NOW - timedelta(hours=2))
+    fresh = make_post(cid="fresh", created_at=NOW - timedelta(minutes=1))
+    repost = make_post(
+        cid="repost",
+        created_at=NOW - timedelta(minutes=2),
+        repost_by=make_author("bob.bsky.social"),
+    )
+    vip = make_post(
+        cid="vip",
+        author=make_author("vip.bsky.social"),
+        created_at=NOW - timedelta(hours=3),
+    )
+    for post in (old, repost, fresh, vip):
+        queue.put(post)
+    assert [p.cid for p in queue.pop_batch(10, NOW)] == [
+        "vip",
+        "fresh",
+        "repost",
+        "old",
+    ]
+    assert len(queue) == 0
+
+
+def test_dedup_and_bounded(monkeypatch):
+    monkeypatch.setattr(config.queue, "maxsize", 2)
+    queue = SendQueue()
+    queue.put(make_post(cid="a", created_at=NOW))
+    queue.put(make_post(cid="a", created_at=NOW))
+    assert len(queue) == 1
+    queue.put(make_post(cid="b", created_at=NOW - timedelta(hours=1)))
+    evicted = queue.put(make_post(cid="c", created_at=NOW), NOW)
+    assert [p.cid for p in evicted] == ["b"]
+
+
+def test_shed_old_reposts_and_collapse(monkeypatch):
+    monkeypatch.setattr(config.queue, "drop_repost_hours", 6)
+    monkeypatch.setattr(config.queue, "summary_over", 2)
+    queue = SendQueue()
+    queue.put(
+        make_post(
+            cid="r",
+            created_at=NOW - timedelta(hours=7),
+            repost_by=make_author("bob.bsky.social"),
+        )
+    )
+    for i in range(4):
+        queue.put(make_post(cid=f"s{i}", created_at=NOW - timedelta(hours=i + 1)))
+    queue.put(make_post(cid="fresh", created_at=NOW))
+    dropped, collapsed = queue.shed(NOW)
+    assert [p.cid for p in dropped] == ["r"]
+    # the oldest stale posts are summarized, fresh ones are kept
+    assert [p.cid for p in collapsed] == ["s3", "s2", "s1"]
+    assert "fresh" in [p.cid for p in queue.pop_batch(10, NOW)]
+
+
+def test_popped_posts_stay_in_flight():
+    queue = SendQueue()
+    post = make_post(cid="a")
+    queue.put(post)
+    assert queue.pop_batch(10, NOW) == [post]
+    assert not len(queue)
+    assert PostCache.key(post) in queue
+    assert queue.put(post) == [] and not len(queue)
+    queue.done([post])
+    assert PostCache.key(post) not in queue
+    queue.put(post)
+    assert len(queue) == 1
+
+
+def test_poll_during_drain_does_not_resend(monkeypatch, tmp_path, unlimited_budget):
+    cache.setup("mem://")
+    monkeypatch.setattr(message_index, "path", tmp_path / "message_index.json")
+    monkeypatch.setattr(timeline, "sources", [Source("timeline")])
+
+    async def main():
+        generator = FeedGenerator(seed=4)
+        server = FakeXrpcServer(generator)
+        await server.start()
+        items = generator.generate(utcnow() - timedelta(minutes=10), 600, 35)
+        server.publish(items)
+        client = LoadBskyClient(server.base_url)
+        bot = FakeTelegram(latency=0.02)
+        try:
+            fetched = await Timeline.fetch_posts(client, force=True)
+            drain = Timeline.start_drain(bot)
+            await asyncio.sleep(0.3)
+            refetched = await Timeline.fetch_posts(client, force=True)
+            await drain
+            await Timeline.drain(bot)
+            return fetched, refetched, bot.calls
+        finally:
+            await server.stop()
+
+    fetched, refetched, calls = asyncio.run(main())
+    assert fetched > 0
+    assert refetched == 0
+    assert calls == fetched
+    assert not send_queue.in_flight
+
+
+def test_waiting_poll_outlasts_background_drain(
+    monkeypatch, tmp_path, unlimited_budget
+):
+    cache.setup("mem://")
+    monkeypatch.setattr(message_index, "path", tmp_path / "message_index.json")
+    monkeypatch.setattr(timeline, "sources", [Source("timeline")])
+
+    async def main():
+        generator = FeedGenerator(seed=5)
+        server = FakeXrpcServer(generator)
+        await server.start()
+        server.publish(generator.generate(utcnow() - timedelta(minutes=10), 600, 35))
+        client = LoadBskyClient(server.base_url)
+        bot = FakeTelegram(latency=0.02)
+        try:
+            fetched = await Timeline.fetch_posts(client, force=True)
+            drain = Timeline.start_drain(bot)
+            await asyncio.sleep(0.1)
+            # a manual check during a scheduled drain returns once all is sent
+            await poll(client, bot, force=True, wait=True)
+            return fetched, bot.calls, drain.done()
+        finally:
+            await server.stop()
+
+    fetched, calls, drained = asyncio.run(main())
+    assert fetched > 0 and calls == fetched
+    assert drained and not len(send_queue)
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import timedelta
+
+from cashews import cache
+
+from src.config import config
+from src.defs import timeline
+from src.defs.send_queue import SendQueue
+from src.defs.sources import Source
+from src.defs.timeline import Timeline
+from tests.load.__main__ import LoadBskyClient
+from tests.load.data import FeedGenerator, utcnow
+from tests.load.xrpc import FakeXrpcServer
+
+
+async def serve(count: int) -> tuple[FakeXrpcServer, FeedGenerator]:
+    generator = FeedGenerator(seed=1)
+    server = FakeXrpcServer(generator)
+    await server.start()
+    server.publish(generator.generate(utcnow() - timedelta(hours=1), 3600, count))
+    return server, generator
+
+
+def test_sources_merged_and_deduped(monkeypatch):
+    cache.setup("mem://")
+    sources = [
+        Source("timeline"),
+        Source("feed", "at://did:plc:x/app.bsky.feed.generator/y"),
+        Source("list", "at://did:plc:x/app.bsky.graph.list/z"),
+    ]
+    monkeypatch.setattr(timeline, "sources", sources)
+
+    async def main():
+        server, _ = await serve(40)
+        try:
+            return await Timeline.get_timeline(LoadBskyClient(server.base_url))
+        finally:
+            await server.stop()
+
+    posts = asyncio.run(main())
+    times = [SendQueue.post_time(post) for post in posts]
+    assert times == sorted(times)
+    keys = [timeline.PostCache.key(post) for post in posts]
+    assert len(keys) == len(set(keys))
+    assert all(source.last_polled for source in sources)
+
+
+def test_interval_and_catch_up(monkeypatch):
+    monkeypatch.setattr(config.feeds, "max_pages", 2)
+    source = Source("timeline", interval=10)
+
+    async def main():
+        server, generator = await serve(10)
+        client = LoadBskyClient(server.base_url)
+        try:
+            first = await source.fetch(client)
+            # a gap bigger than one page, paged back up to max_pages
+            server.publish(generator.generate(utcnow(), 1, 120))
+            second = await source.fetch(client)
+            resumed = source.cursor is not None
+            third = await source.fetch(client)
+            return first, second, resumed, third
+        finally:
+            await server.stop()
+
+    first, second, resumed, third = asyncio.run(main())
+    assert len(first) == 10
+    assert len(second) == 100
+    assert resumed
+    # the next poll reads the newest page and continues the catch-up,
+    # down to the 20 remaining new posts and the first 10 already seen
+    assert len(third) == 50 + 30
+    items = {
+        (item.post.uri, item.reason.indexed_at if item.reason else None)
+        for item in first + second + third
+    }
+    assert len(items) == 130
+    assert source.cursor is None
+    assert not source.is_due(source.last_polled + 60)
+    assert source.is_due(source.last_polled + 600)